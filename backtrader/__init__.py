@@ -60,6 +60,9 @@ from .writer import *
 from .signal import *
 
 from .cerebro import *
+from .optstore import *
+from .profiler import *
+from .indcache import *
 from .timer import *
 from .flt import *
 
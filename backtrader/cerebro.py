@@ -23,8 +23,17 @@ from __future__ import (absolute_import, division, print_function,
 
 import datetime
 import collections
+import gc
+import importlib
 import itertools
 import multiprocessing
+import os
+import pickle
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 try:  # For new Python versions
     collectionsAbc = collections.abc  # collections.Iterable -> collections.abc.Iterable
@@ -41,15 +50,150 @@ from .brokers import BackBroker
 from .metabase import MetaParams
 from . import observers
 from .writer import WriterFile
-from .utils import OrderedDict, tzparse, num2date, date2num
+from .utils import (OrderedDict, tzparse, num2date, date2num,
+                    num2date_array)
+from .lineiterator import LineIterator
 from .strategy import Strategy, SignalStrategy
 from .tradingcal import (TradingCalendarBase, TradingCalendar,
                          PandasMarketCalendar)
 from .timer import Timer
+from .profiler import Profiler
+from .indcache import IndicatorCache
 
-# Defined here to make it pickable. Ideally it could be defined inside Cerebro
+# Cerebro in an optimization worker process, handed over once by the pool
+# initializer (optshared) or with the first task of a run (OptPool). Tasks
+# carry only the strategies to run
+_optcerebro = None
+_optkey = None
+
+
+def _optinit(cerebro):
+    global _optcerebro
+    _optcerebro = cerebro
+
+
+def _optrun(iterstrat):
+    return _optcerebro(iterstrat)
+
+
+def _optwarm(modules):
+    for module in modules:
+        importlib.import_module(module)
+
+
+def _optpoolrun(task):
+    global _optcerebro, _optkey
+
+    key, payload, iterstrat = task
+    if key != _optkey:
+        # a new run: forget the cerebro (and shared datas) of the previous one
+        _optcerebro = _optkey = None
+        linebuffer.SharedStorage.detach()
+        gc.collect()
+
+        if isinstance(payload, tuple):  # (name, size) of a shared block
+            name, size = payload
+            shm = linebuffer.shared_memory.SharedMemory(name=name)
+            try:
+                payload = bytes(shm.buf[:size])
+            finally:
+                shm.close()
+
+        _optcerebro = pickle.loads(payload)
+        _optkey = key
+
+    return _optcerebro(iterstrat)
 
 
+class OptPool(object):
+    '''
+    Pool of worker processes to run optimizations, which stays alive across
+    ``run`` calls of one or more ``Cerebro`` instances (see the ``optpool``
+    parameter of ``Cerebro``)
+
+    Creating worker processes and importing the modules needed by the
+    strategies can take longer than running the strategies. The workers of
+    this pool are started only once and can import the modules in advance.
+    Cerebro is handed over to each worker once per ``run`` and kept there
+    until the next ``run``
+
+    Params:
+
+      - ``processes`` (default: ``None`` -> all available cores)
+
+      - ``modules`` (default: ``()``): names of the modules to import when
+        the worker processes start
+
+    Call ``close`` (or use the pool as a context manager) to stop the worker
+    processes when they are no longer needed
+    '''
+
+    def __init__(self, processes=None, modules=()):
+        self.processes = processes
+        self.modules = tuple(modules)
+
+        if linebuffer.shared_memory is not None and os.name == 'posix':
+            # have the workers share the tracker of shared memory blocks with
+            # this process, else they start their own and report the blocks
+            # unlinked here as leaked
+            from multiprocessing import resource_tracker
+            resource_tracker.ensure_running()
+
+        self._pool = multiprocessing.Pool(processes,
+                                          initializer=_optwarm,
+                                          initargs=(self.modules,))
+        self._runs = itertools.count()
+
+    def __getstate__(self):
+        # the pool can only be used by the process which created it
+        rv = vars(self).copy()
+        rv['_pool'] = None
+        rv['_runs'] = None
+        return rv
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        '''Stops the worker processes once the pending tasks are done'''
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+    def imap(self, cerebro, iterstrats):
+        '''
+        Runs each of ``iterstrats`` with ``cerebro`` in the worker processes
+        and yields the results in order
+        '''
+        if self._pool is None:
+            raise ValueError('OptPool is closed')
+
+        key = (os.getpid(), id(self), next(self._runs))
+        payload = pickle.dumps(cerebro, pickle.HIGHEST_PROTOCOL)
+
+        shm = None
+        if linebuffer.shared_memory is not None:
+            # the workers fetch cerebro once, not with each task
+            shm = linebuffer.shared_memory.SharedMemory(
+                create=True, size=max(len(payload), 1))
+            shm.buf[:len(payload)] = payload
+            payload = (shm.name, len(payload))
+
+        try:
+            tasks = ((key, payload, iterstrat) for iterstrat in iterstrats)
+            for r in self._pool.imap(_optpoolrun, tasks):
+                yield r
+        finally:
+            if shm is not None:
+                shm.close()
+                shm.unlink()
+
+
+# Defined here to make it pickable. Ideally it could be defined inside Cerebro
 class OptReturn(object):
     def __init__(self, params, **kwargs):
         self.p = self.params = params
@@ -160,10 +304,33 @@ class Cerebro(with_metaclass(MetaParams, object)):
 
             - ``runonce`` will be deactivated
 
+      - ``chunkbars`` (default: ``0``)
+
+        If not ``0``, ``runonce`` keeps memory bounded: the datas are loaded
+        in chunks of this many bars, the indicators calculate each chunk
+        in vectorized mode and the bars already delivered to the strategies
+        are removed from the lines, keeping the longest minimum period of
+        the system (the lookback needed to go on calculating)
+
+        Memory is bounded like with ``exactbars`` but ``runonce`` stays
+        active. Only the values kept can be reached with ``ago``: do not
+        look further back than the minimum period of the strategy (e.g.:
+        ``self.data.close.get(size=n)``)
+
+        Notes:
+
+          - Only active with ``runonce`` and ``preload``. Not with
+            ``exactbars``, ``oldsync``, replaying or live datas
+
+          - Indicators which calculate a chunk with ``numpy`` (sums of a
+            window) may differ in the last digits from a single calculation
+
+          - Deactivates **plotting** and ``indcache``
+
       - ``objcache`` (default: ``False``)
 
-        Experimental option to implement a cache of lines objects and reduce
-        the amount of them. Example from UltimateOscillator::
+        Cache of lines objects to reduce the amount of them and of
+        calculations. Example from UltimateOscillator::
 
           bp = self.data.close - TrueLow(self.data)
           tr = TrueRange(self.data)  # -> creates another TrueLow(self.data)
@@ -172,8 +339,30 @@ class Cerebro(with_metaclass(MetaParams, object)):
         matches the signature of the one in the ``bp`` calculation. It will be
         reused.
 
-        Corner cases may happen in which this drives a line object off its
-        minimum period and breaks things and it is therefore disabled.
+        Indicators are reused when the class, the inputs (datas/lines) and the
+        params match, also across the strategies of a run (two strategies
+        with ``SMA(self.data, period=50)`` calculate it once). The indicator
+        is calculated by the first object which created it and the others
+        take its minimum period into account.
+
+        Line operations (``self.data.close - x``, ``x(-1)``) are only reused
+        within the object which created them.
+
+        Not active with ``exactbars`` (memory savings)
+
+      - ``indcache`` (default: ``None``)
+
+        Directory for a cache on disk of the values of the indicators of the
+        strategies calculated with ``runonce`` (see ``IndicatorCache``). The
+        values of an indicator (and of anything it uses) are taken from the
+        cache if the contents of its datas, its class (code included), its
+        params and inputs match those of an earlier run, also from another
+        process. Only used with ``runonce``
+
+      - ``indcachesize`` (default: ``256``)
+
+        Megabytes the cache in ``indcache`` may take. The least recently used
+        values are removed when it grows beyond it
 
       - ``writer`` (default: ``False``)
 
@@ -214,6 +403,49 @@ class Cerebro(with_metaclass(MetaParams, object)):
         with ``optdatas`` the total gain increases to a total speed-up of
         ``32%`` in an optimization run.
 
+      - ``optshared`` (default: ``False``)
+
+        If ``True`` and optimizing with several processes, cerebro is handed
+        to each worker process only once and the tasks carry only the
+        strategies and parameters to run.
+
+        If ``optdatas`` is also in effect, the preloaded datas are moved to a
+        block of ``multiprocessing.shared_memory`` which the workers attach to
+        without copying it, rather than receiving a copy of the datas.
+
+        Shared memory needs Python >= 3.8 and ``numpy``. Without them only the
+        single hand over of cerebro takes place
+
+      - ``optpool`` (default: ``None``)
+
+        An ``OptPool`` whose worker processes run the optimization instead of
+        a pool created (and stopped) by each ``run``. The same ``OptPool`` can
+        be given to several cerebro instances and runs. ``maxcpus`` has no
+        effect when it is set
+
+        ``optshared`` keeps moving the preloaded datas to shared memory
+
+      - ``optstore`` (default: ``None``)
+
+        An ``OptStore`` (like ``SQLiteOptStore`` or ``ParquetOptStore``) to
+        which the results of an optimization are handed as each run
+        finishes, rather than being collected and returned by ``run``, which
+        then returns an empty list.
+
+        Runs whose results are already in the store are skipped, which allows
+        resuming an interrupted optimization
+
+      - ``profile`` (default: ``False``)
+
+        Record the wall time spent and the number of calls in the data feeds
+        (loading), the broker, the strategies, indicators, observers and
+        analyzers. The results are a ``Profile`` table, set as the attribute
+        ``profile`` of each of the returned strategies (also when optimizing
+        with ``optreturn``)
+
+        The timing adds overhead to each call, which is included in the
+        recorded times
+
       - ``oldsync`` (default: ``False``)
 
         Starting with release 1.9.0.99 the synchronization of multiple datas
@@ -269,6 +501,30 @@ class Cerebro(with_metaclass(MetaParams, object)):
 
         Set to ``False`` for compatibility. May be changed to ``True``
 
+      - ``linestorage`` (default: ``array``)
+
+        Storage used by the lines which keep all values in memory (i.e.: not
+        affected by ``exactbars``)
+
+          - ``array``: a standard python ``array.array`` of doubles
+
+          - ``numpy``: a preallocated and growable ``numpy.ndarray``. Data
+            feeds, indicators and observers can get zero-copy views of the
+            values with ``line.ndarray()``, which is what vectorized ``once``
+            implementations work on
+
+        Single value access (as in ``next``) is slightly slower with
+        ``numpy`` and ``numpy`` must be installed
+
+        The values are doubles, unless lines are declared with another
+        ``dtype`` (``float32`` halves the memory). Either in the class::
+
+          class MyData(bt.feeds.PandasData):
+              linedtypes = dict(volume='f')
+
+        or for a single object with the ``linedtypes`` argument, e.g.:
+        ``bt.ind.RSI(self.data, linedtypes=dict(rsi='f'))``
+
     '''
 
     params = (
@@ -280,9 +536,16 @@ class Cerebro(with_metaclass(MetaParams, object)):
         ('oldtrades', False),
         ('lookahead', 0),
         ('exactbars', False),
+        ('chunkbars', 0),
         ('optdatas', True),
         ('optreturn', True),
+        ('optshared', False),
+        ('optpool', None),
+        ('optstore', None),
+        ('profile', False),
         ('objcache', False),
+        ('indcache', None),
+        ('indcachesize', 256),
         ('live', False),
         ('writer', False),
         ('tradehistory', False),
@@ -291,6 +554,7 @@ class Cerebro(with_metaclass(MetaParams, object)):
         ('cheat_on_open', False),
         ('broker_coo', True),
         ('quicknotify', False),
+        ('linestorage', 'array'),
     )
 
     def __init__(self):
@@ -972,7 +1236,7 @@ class Cerebro(with_metaclass(MetaParams, object)):
 
         ``tight``: only save actual content and not the frame of the figure
         '''
-        if self._exactbars > 0:
+        if self._exactbars > 0 or self._chunkbars:
             return
 
         if not plotter:
@@ -1008,7 +1272,8 @@ class Cerebro(with_metaclass(MetaParams, object)):
         module without complains
         '''
 
-        predata = self.p.optdatas and self._dopreload and self._dorunonce
+        predata = self.p.optdatas and self._dopreload and self._dorunonce \
+            and not self._chunkbars
         return self.runstrategies(iterstrat, predata=predata)
 
     def __getstate__(self):
@@ -1052,12 +1317,8 @@ class Cerebro(with_metaclass(MetaParams, object)):
             if key in pkeys:
                 setattr(self.params, key, val)
 
-        # Manage activate/deactivate object cache
-        linebuffer.LineActions.cleancache()  # clean cache
-        indicator.Indicator.cleancache()  # clean cache
-
-        linebuffer.LineActions.usecache(self.p.objcache)
-        indicator.Indicator.usecache(self.p.objcache)
+        # Storage for the lines created (or reset) from now on
+        linebuffer.LineBuffer.usestorage(self.p.linestorage)
 
         self._dorunonce = self.p.runonce
         self._dopreload = self.p.preload
@@ -1067,6 +1328,15 @@ class Cerebro(with_metaclass(MetaParams, object)):
             self._dorunonce = False  # something is saving memory, no runonce
             self._dopreload = self._dopreload and self._exactbars < 1
 
+        # Manage activate/deactivate object cache. Not with memory savings,
+        # which would size the buffers of reused objects for a single user
+        linebuffer.LineActions.cleancache()  # clean cache
+        indicator.Indicator.cleancache()  # clean cache
+
+        objcache = self.p.objcache and not self._exactbars
+        linebuffer.LineActions.usecache(objcache)
+        indicator.Indicator.usecache(objcache)
+
         self._doreplay = self._doreplay or any(x.replaying for x in self.datas)
         if self._doreplay:
             # preloading is not supported with replay. full timeframe bars
@@ -1078,6 +1348,16 @@ class Cerebro(with_metaclass(MetaParams, object)):
             self._dorunonce = False
             self._dopreload = False
 
+        self._chunkbars = 0
+        if self._dopreload and self._dorunonce and not self.p.oldsync:
+            self._chunkbars = int(self.p.chunkbars)
+
+        indcache = None
+        if self.p.indcache and not self._chunkbars:
+            indcache = IndicatorCache(self.p.indcache,
+                                      self.p.indcachesize * 1024 * 1024)
+        indicator.Indicator.usediskcache(indcache)
+
         self.runwriters = list()
 
         # Add the system default writer if requested
@@ -1125,36 +1405,88 @@ class Cerebro(with_metaclass(MetaParams, object)):
             self.addstrategy(Strategy)
 
         iterstrats = itertools.product(*self.strats)
-        if not self._dooptimize or self.p.maxcpus == 1:
-            # If no optimmization is wished ... or 1 core is to be used
-            # let's skip process "spawning"
-            for iterstrat in iterstrats:
-                runstrat = self.runstrategies(iterstrat)
-                self.runstrats.append(runstrat)
-                if self._dooptimize:
-                    for cb in self.optcbs:
-                        cb(runstrat)  # callback receives finished strategy
-        else:
-            if self.p.optdatas and self._dopreload and self._dorunonce:
-                for data in self.datas:
-                    data.reset()
-                    if self._exactbars < 1:  # datas can be full length
-                        data.extend(size=self.params.lookahead)
-                    data._start()
-                    if self._dopreload:
-                        data.preload()
 
-            pool = multiprocessing.Pool(self.p.maxcpus or None)
-            for r in pool.imap(self, iterstrats):
-                self.runstrats.append(r)
-                for cb in self.optcbs:
-                    cb(r)  # callback receives finished strategy
+        optstore = self.p.optstore if self._dooptimize else None
+        if optstore is not None:
+            optstore.start()
+            iterstrats = (x for x in iterstrats if not optstore.isdone(x))
+
+        try:
+            if not self._dooptimize or \
+               (self.p.maxcpus == 1 and self.p.optpool is None):
+                # If no optimmization is wished ... or 1 core is to be used
+                # let's skip process "spawning"
+                for iterstrat in iterstrats:
+                    runstrat = self.runstrategies(iterstrat)
+                    if optstore is not None:
+                        optstore.add(runstrat)
+                    else:
+                        self.runstrats.append(runstrat)
+
+                    if self._dooptimize:
+                        for cb in self.optcbs:
+                            cb(runstrat)  # callback receives finished strategy
+            else:
+                if self.p.optdatas and self._dopreload and \
+                   self._dorunonce and not self._chunkbars:
+                    for data in self.datas:
+                        data.reset()
+                        if self._exactbars < 1:  # datas can be full length
+                            data.extend(size=self.params.lookahead)
+                        data._start()
+                        if self._dopreload:
+                            data.preload()
+
+                shared = None
+                if self.p.optshared:
+                    if self.p.optdatas and self._dopreload and \
+                       self._dorunonce and not self._chunkbars:
+                        shared = self._publishdatas()
+
+                pool = None
+                if self.p.optpool is not None:
+                    results = self.p.optpool.imap(self, iterstrats)
+                elif not self.p.optshared:
+                    pool = multiprocessing.Pool(self.p.maxcpus or None)
+                    results = pool.imap(self, iterstrats)
+                else:
+                    pool = multiprocessing.Pool(self.p.maxcpus or None,
+                                                initializer=_optinit,
+                                                initargs=(self,))
+                    results = pool.imap(_optrun, iterstrats)
+
+                try:
+                    for r in results:
+                        if optstore is not None:
+                            optstore.add(r)
+                        else:
+                            self.runstrats.append(r)
+
+                        for cb in self.optcbs:
+                            cb(r)  # callback receives finished strategy
+                except BaseException:
+                    if pool is not None:
+                        pool.terminate()  # drop the pending combinations
+                    raise
+                finally:
+                    # also if a worker (or a callback) failed, not to leave the
+                    # block of the datas behind
+                    if pool is not None:
+                        pool.close()
+                    else:
+                        results.close()  # OptPool.imap frees its payload
 
-            pool.close()
+                    if shared is not None:
+                        linebuffer.SharedStorage.withdraw(*shared)
 
-            if self.p.optdatas and self._dopreload and self._dorunonce:
-                for data in self.datas:
-                    data.stop()
+                    if self.p.optdatas and self._dopreload and \
+                       self._dorunonce and not self._chunkbars:
+                        for data in self.datas:
+                            data.stop()
+        finally:
+            # also on errors, to keep the finished runs when resuming
+            if optstore is not None:
+                optstore.stop()
 
         if not self._dooptimize:
             # avoid a list of list for regular cases
@@ -1162,6 +1494,21 @@ class Cerebro(with_metaclass(MetaParams, object)):
 
         return self.runstrats
 
+    def _publishdatas(self):
+        '''
+        Moves the values of the preloaded datas to shared memory for the
+        optimization workers. Returns the arguments for
+        ``SharedStorage.withdraw`` or ``None`` if it cannot be done
+        '''
+        lines = [line for data in self.datas for line in data.lines
+                 if not line.useislice]
+        try:
+            shm, previous = linebuffer.SharedStorage.publish(lines)
+        except bt.errors.ModuleImportError:
+            return None
+
+        return lines, shm, previous
+
     def _init_stcount(self):
         self.stcount = itertools.count(0)
 
@@ -1174,6 +1521,11 @@ class Cerebro(with_metaclass(MetaParams, object)):
         '''
         self._init_stcount()
 
+        # The cached objects belong to the strategies of the previous run (an
+        # optimization runs several in the same process)
+        linebuffer.LineActions.cleancache()
+        indicator.Indicator.cleancache()
+
         self.runningstrats = runstrats = list()
         for store in self.stores:
             store.start()
@@ -1194,6 +1546,13 @@ class Cerebro(with_metaclass(MetaParams, object)):
         for feed in self.feeds:
             feed.start()
 
+        profiler = None
+        if self.p.profile:
+            profiler = Profiler()
+            profiler.addbroker(self._broker)
+            for data in self.datas:
+                profiler.adddata(data)
+
         if self.writers_csv:
             wheaders = list()
             for data in self.datas:
@@ -1213,7 +1572,7 @@ class Cerebro(with_metaclass(MetaParams, object)):
                 if self._exactbars < 1:  # datas can be full length
                     data.extend(size=self.params.lookahead)
                 data._start()
-                if self._dopreload:
+                if self._dopreload and not self._chunkbars:
                     data.preload()
 
         for stratcls, sargs, skwargs in iterstrat:
@@ -1279,6 +1638,10 @@ class Cerebro(with_metaclass(MetaParams, object)):
             for writer in self.runwriters:
                 writer.start()
 
+            if profiler is not None:
+                for strat in runstrats:
+                    profiler.addstrategy(strat)
+
             # Prepare timers
             self._timers = []
             self._timerscheat = []
@@ -1294,9 +1657,16 @@ class Cerebro(with_metaclass(MetaParams, object)):
             if self._dopreload and self._dorunonce:
                 if self.p.oldsync:
                     self._runonce_old(runstrats)
+                elif self._chunkbars:
+                    self._runonce_chunked(runstrats)
                 else:
                     self._runonce(runstrats)
             else:
+                if self._chunkbars and self._dopreload:
+                    # runonce disabled by a lineiterator (see HeikinAshi)
+                    for data in self.datas:
+                        data.preload()
+
                 if self.p.oldsync:
                     self._runnext_old(runstrats)
                 else:
@@ -1305,6 +1675,11 @@ class Cerebro(with_metaclass(MetaParams, object)):
             for strat in runstrats:
                 strat._stop()
 
+        if profiler is not None:
+            profile = profiler.stop()
+            for strat in runstrats:
+                strat.profile = profile
+
         self._broker.stop()
 
         if not predata:
@@ -1331,6 +1706,8 @@ class Cerebro(with_metaclass(MetaParams, object)):
                             setattr(a, attrname, None)
 
                 oreturn = OptReturn(strat.params, analyzers=strat.analyzers, strategycls=type(strat))
+                if profiler is not None:
+                    oreturn.profile = strat.profile
                 results.append(oreturn)
 
             return results
@@ -1502,6 +1879,16 @@ class Cerebro(with_metaclass(MetaParams, object)):
         '''
         datas = sorted(self.datas,
                        key=lambda x: (x._timeframe, x._compression))
+
+        if self._dopreload and not self.stores and \
+           not any(d.islive() or d.resampling or d.replaying or d._filters
+                   for d in datas):
+            # historical datas which only deliver their own preloaded bars
+            timeline = self._timeline(datas)
+            if timeline is not None:
+                self._runnext_preloaded(runstrats, datas, timeline)
+                return
+
         datas1 = datas[1:]
         data0 = datas[0]
         d0ret = True
@@ -1646,6 +2033,69 @@ class Cerebro(with_metaclass(MetaParams, object)):
         if self._event_stop:  # stop if requested
             return
 
+    def _runnext_preloaded(self, runstrats, datas, timeline):
+        '''
+        Run in next mode for historical preloaded datas, following the
+        timeline of the datas (see ``_timeline``) rather than moving all the
+        datas, comparing their datetimes and rewinding those ahead with each
+        step. Without live datas the waits for live data and the stores are
+        left out
+        '''
+        # datetimes of the steps converted at once, for the timezone of each
+        # data (the first data of a step is its master)
+        dt0s = [dt0 for dt0, stepdatas in timeline]
+        udtmasters = num2date_array(dt0s)
+        dtmasters = {None: udtmasters}
+        for data in datas:
+            if data._tz not in dtmasters:
+                dtmasters[data._tz] = num2date_array(dt0s, tz=data._tz)
+
+        for i, (dt0, stepdatas) in enumerate(timeline):
+            self._datanotify()
+            if self._event_stop:  # stop if requested
+                return
+
+            for data in stepdatas:
+                data.advance(ticks=False)
+                data._tick_fill(force=True)
+
+            self._dtmaster = dtmasters[stepdatas[0]._tz][i]
+            self._udtmaster = udtmasters[i]
+
+            # Datas may have generated a new notification after next
+            self._datanotify()
+            if self._event_stop:  # stop if requested
+                return
+
+            self._check_timers(runstrats, dt0, cheat=True)
+            if self.p.cheat_on_open:
+                for strat in runstrats:
+                    strat._next_open()
+                    if self._event_stop:  # stop if requested
+                        return
+
+            self._brokernotify()
+            if self._event_stop:  # stop if requested
+                return
+
+            self._check_timers(runstrats, dt0, cheat=False)
+            for strat in runstrats:
+                strat._next()
+                if self._event_stop:  # stop if requested
+                    return
+
+                self._next_writers(runstrats)
+
+        # Last notification chance before stopping
+        self._datanotify()
+        if self._event_stop:  # stop if requested
+            return
+
+        for data in datas:
+            data._last(datamaster=None if data is datas[0] else datas[0])
+
+        self._datanotify()
+
     def _runonce(self, runstrats):
         '''
         Actual implementation of run in vector mode.
@@ -1664,45 +2114,208 @@ class Cerebro(with_metaclass(MetaParams, object)):
         datas = sorted(self.datas,
                        key=lambda x: (x._timeframe, x._compression))
 
-        while True:
-            # Check next incoming date in the datas
-            dts = [d.advance_peek() for d in datas]
-            dt0 = min(dts)
-            if dt0 == float('inf'):
-                break  # no data delivers anything
-
-            # Timemaster if needed be
-            # dmaster = datas[dts.index(dt0)]  # and timemaster
-            slen = len(runstrats[0])
-            for i, dti in enumerate(dts):
-                if dti <= dt0:
-                    datas[i].advance()
-                    # self._plotfillers2[i].append(slen)  # mark as fill
-                else:
-                    # self._plotfillers[i].append(slen)
-                    pass
+        self._runonce_loop(runstrats, self._runonce_steps(datas))
 
+    def _runonce_loop(self, runstrats, steps):
+        '''
+        Delivers the bars of the ``steps`` (see ``_runonce_steps``) to the
+        strategies. Returns ``False`` if a stop was requested
+        '''
+        for dt0 in steps:
             self._check_timers(runstrats, dt0, cheat=True)
 
             if self.p.cheat_on_open:
                 for strat in runstrats:
                     strat._oncepost_open()
                     if self._event_stop:  # stop if requested
-                        return
+                        return False
 
             self._brokernotify()
             if self._event_stop:  # stop if requested
-                return
+                return False
 
             self._check_timers(runstrats, dt0, cheat=False)
 
             for strat in runstrats:
                 strat._oncepost(dt0)
                 if self._event_stop:  # stop if requested
-                    return
+                    return False
 
                 self._next_writers(runstrats)
 
+        return True
+
+    def _runonce_chunked(self, runstrats):
+        '''
+        Implementation of run in vector mode with bounded memory (see the
+        ``chunkbars`` parameter)
+
+        The datas are loaded in chunks, the indicators calculate in vector
+        mode the values of each new chunk and the bars are delivered to the
+        strategies up to the last datetime loaded by all datas. The values
+        which are no longer needed are then removed from the lines
+        '''
+        datas = sorted(self.datas,
+                       key=lambda x: (x._timeframe, x._compression))
+
+        def nodelines(node):
+            # lines of the node and of the objects it calculates
+            lines = list(node.lines)
+            for child in getattr(node, '_lineiterators', {}).get(
+                    LineIterator.IndType, []):
+                lines.extend(nodelines(child))
+
+            return lines
+
+        # lines calculated in vector mode (along the datas) and in next mode
+        # (along the strategies)
+        lines = [line for data in self.datas for line in data.lines]
+        nextlines = []
+        for strat in runstrats:
+            for ind in strat._lineiterators[LineIterator.IndType]:
+                lines.extend(nodelines(ind))
+
+            nextlines.extend(strat.lines)
+            for obs in strat._lineiterators[LineIterator.ObsType]:
+                nextlines.extend(nodelines(obs))
+
+        lines = list(OrderedDict((id(x), x) for x in lines).values())
+        nextlines = list(OrderedDict((id(x), x) for x in nextlines).values())
+
+        # lookback needed to go on calculating
+        keep = max(x._minperiod for x in lines + nextlines + runstrats) + 1
+
+        pending = list(self.datas)
+        while True:
+            # top up the bars not yet delivered to the strategies
+            sizes = [self._chunkbars - (data.buflen() - 1 - data.lines[0].idx)
+                     for data in pending]
+
+            # calculate only the values beyond those held
+            positions = [(line.idx, line.lencount) for line in lines]
+            for line in lines:
+                line.idx = line.buflen() - 1
+                line.lencount = line.discarded + line.buflen()
+                line.sethome()
+
+            for data, size in list(zip(pending, sizes)):
+                if size > 0 and not data.preloadchunk(size):
+                    pending.remove(data)
+
+            for strat in runstrats:
+                for ind in strat._lineiterators[LineIterator.IndType]:
+                    ind._once()
+
+            for line, (idx, lencount) in zip(lines, positions):
+                line.idx, line.lencount = idx, lencount
+
+            # deliver up to the last datetime loaded by all datas
+            limit = min([data.lines.datetime.array[data.buflen() - 1]
+                         for data in pending if data.buflen()] or [None])
+            steps = self._runonce_steps(datas, limit=limit)
+            if not self._runonce_loop(runstrats, steps) or not pending:
+                return
+
+            self._discardlines(lines, nextlines, keep)
+
+    def _discardlines(self, lines, nextlines, keep):
+        '''
+        Removes from the lines the values delivered to the strategies, but
+        for the last ``keep``
+
+        The ``lines`` calculated in vector mode go along the data with the
+        same length, the ``nextlines`` keep the values before their position
+        '''
+        delivered = dict()
+        for data in self.datas:
+            dtline = data.lines.datetime
+            end = dtline.discarded + dtline.buflen()
+            delivered[end] = min(delivered.get(end, end), len(data))
+
+        for line in lines:
+            end = delivered.get(line.discarded + line.buflen())
+            if end is not None and end - keep > line.discarded:
+                line.discard(end - keep - line.discarded)
+
+        for line in nextlines:
+            if line.idx + 1 > keep:
+                line.discard(line.idx + 1 - keep)
+
+    def _runonce_steps(self, datas, limit=None):
+        '''
+        Advances the datas which deliver a bar at each step of the run and
+        yields the datetime of the step (up to ``limit`` if given)
+        '''
+        timeline = self._timeline(datas)
+        if timeline is not None:
+            for dt0, stepdatas in timeline:
+                if limit is not None and dt0 > limit:
+                    break
+
+                for data in stepdatas:
+                    data.advance()
+
+                yield dt0
+
+            return
+
+        while True:
+            # Check next incoming date in the datas
+            dts = [d.advance_peek() for d in datas]
+            dt0 = min(dts)
+            if dt0 == float('inf'):
+                break  # no data delivers anything
+
+            if limit is not None and dt0 > limit:
+                break
+
+            for i, dti in enumerate(dts):
+                if dti <= dt0:
+                    datas[i].advance()
+
+            yield dt0
+
+    def _timeline(self, datas):
+        '''
+        Merges the datetimes of the bars still to be delivered by the
+        (preloaded) datas into a single timeline
+
+        Returns a list with the datetime of each step and the datas which
+        deliver a bar at it (steps with the same datas share the list), or
+        ``None`` if ``numpy`` is not available or the datetimes of a data are
+        not strictly increasing, in which case the datas have to be peeked at
+        with each step
+        '''
+        if np is None:
+            return None
+
+        dts = []
+        for data in datas:
+            line = data.lines.datetime
+            dtline = line.ndarray()
+            if dtline is None:
+                return None
+
+            dt = np.array(dtline[line.idx + 1:line.buflen()])
+            if np.isnan(dt).any() or (np.diff(dt) <= 0.0).any():
+                return None
+
+            dts.append(dt)
+
+        if not dts:
+            return []
+
+        timeline = np.unique(np.concatenate(dts))
+        delivers = np.zeros((len(timeline), len(datas)), dtype=bool)
+        for i, dt in enumerate(dts):
+            delivers[np.searchsorted(timeline, dt), i] = True
+
+        groups, steps = np.unique(delivers, axis=0, return_inverse=True)
+        groups = [[datas[i] for i in np.flatnonzero(group)]
+                  for group in groups]
+        return list(zip(timeline.tolist(),
+                        [groups[i] for i in steps.reshape(-1).tolist()]))
+
     def _check_timers(self, runstrats, dt0, cheat=False):
         timers = self._timers if not cheat else self._timerscheat
         for t in timers:
@@ -48,6 +48,14 @@ class MetaAbstractDataBase(dataseries.OHLCDateTime.__class__):
         # Initialize the class
         super(MetaAbstractDataBase, cls).__init__(name, bases, dct)
 
+        # index of the lines and name of their tick_xxx attributes, to update
+        # the ticks with each bar without building the names
+        cls._ticklines = tuple(
+            (i, 'tick_' + alias)
+            for i, alias in enumerate(cls.lines.getlinealiases())
+            if alias != 'datetime')
+        cls._tickalias0 = 'tick_' + cls.lines._getlinealias(0)
+
         if not cls.aliased and \
            name != 'DataBase' and not name.startswith('_'):
             cls._indcol[name] = cls
@@ -349,25 +357,27 @@ class AbstractDataBase(with_metaclass(MetaAbstractDataBase,
         # and the length doesn't change like if a replay is happening or
         # a real-time data feed is in use and 1 minutes bars are being
         # constructed with 5 seconds updates
-        for lalias in self.getlinealiases():
-            if lalias != 'datetime':
-                setattr(self, 'tick_' + lalias, None)
+        for i, tickname in self._ticklines:
+            setattr(self, tickname, None)
 
         self.tick_last = None
 
     def _tick_fill(self, force=False):
         # If nothing filled the tick_xxx attributes, the bar is the tick
-        alias0 = self._getlinealias(0)
-        if force or getattr(self, 'tick_' + alias0, None) is None:
-            for lalias in self.getlinealiases():
-                if lalias != 'datetime':
-                    setattr(self, 'tick_' + lalias,
-                            getattr(self.lines, lalias)[0])
+        if force or getattr(self, self._tickalias0, None) is None:
+            lines = self.lines.lines
+            for i, tickname in self._ticklines:
+                setattr(self, tickname, lines[i][0])
+
+            self.tick_last = lines[0][0]
 
-            self.tick_last = getattr(self.lines, alias0)[0]
+    def _buflen(self):
+        # len up to the end of the buffer (values can be discarded from its
+        # beginning in chunked runonce)
+        return self.buflen() + self.lines.datetime.discarded
 
     def advance_peek(self):
-        if len(self) < self.buflen():
+        if len(self) < self._buflen():
             return self.lines.datetime[1]  # return the future
 
         return float('inf')  # max date else
@@ -381,7 +391,7 @@ class AbstractDataBase(with_metaclass(MetaAbstractDataBase,
         self.lines.advance(size)
 
         if datamaster is not None:
-            if len(self) > self.buflen():
+            if len(self) > self._buflen():
                 # if no bar can be delivered, fill with an empty bar
                 self.rewind()
                 self.lines.forward()
@@ -392,14 +402,14 @@ class AbstractDataBase(with_metaclass(MetaAbstractDataBase,
             else:
                 if ticks:
                     self._tick_fill()
-        elif len(self) < self.buflen():
+        elif len(self) < self._buflen():
             # a resampler may have advance us past the last point
             if ticks:
                 self._tick_fill()
 
     def next(self, datamaster=None, ticks=True):
 
-        if len(self) >= self.buflen():
+        if len(self) >= self._buflen():
             if ticks:
                 self._tick_nullify()
 
@@ -442,6 +452,21 @@ class AbstractDataBase(with_metaclass(MetaAbstractDataBase,
         self._last()
         self.home()
 
+    def preloadchunk(self, size):
+        '''Loads up to ``size`` more bars into the buffer and rewinds the
+        data (see ``home``). Returns ``False`` once the data has no more bars
+
+        Used by the chunked runonce of ``Cerebro``
+        '''
+        for i in range(size):
+            if not self.load():
+                self._last()
+                self.home()
+                return False
+
+        self.home()
+        return True
+
     def _last(self, datamaster=None):
         # Last chance for filters to deliver something
         ret = 0
@@ -781,6 +806,13 @@ class DataClone(AbstractDataBase):
         self.data.home()  # preloading data was pushed forward
         self._preloading = False
 
+    def preloadchunk(self, size):
+        self._preloading = True
+        ret = super(DataClone, self).preloadchunk(size)
+        self.data.home()  # preloading data was pushed forward
+        self._preloading = False
+        return ret
+
     def _load(self):
         # assumption: the data is in the system
         # simply copy the lines
@@ -788,7 +820,7 @@ class DataClone(AbstractDataBase):
             # data is preloaded, we are preloading too, can move
             # forward until have full bar or data source is exhausted
             self.data.advance()
-            if len(self.data) > self.data.buflen():
+            if len(self.data) > self.data._buflen():
                 return False
 
             for line, dline in zip(self.lines, self.data.lines):
@@ -21,9 +21,15 @@
 from __future__ import (absolute_import, division, print_function,
                         unicode_literals)
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 from backtrader.utils.py3 import filter, string_types, integer_types
 
 from backtrader import date2num
+from backtrader.utils import date2num_array
 import backtrader.feed as feed
 
 
@@ -231,14 +237,9 @@ class PandasData(feed.DataBase):
 
             self._colmapping[k] = v
 
-    def _load(self):
-        self._idx += 1
-
-        if self._idx >= len(self.p.dataname):
-            # exhausted all rows
-            return False
-
-        # Set the standard datafields
+        # Fetch the columns and convert the datetimes in advance, to avoid
+        # going through pandas for each value of each row
+        self._colvalues = list()
         for datafield in self.getlinealiases():
             if datafield == 'datetime':
                 continue
@@ -248,13 +249,42 @@ class PandasData(feed.DataBase):
                 # datafield signaled as missing in the stream: skip it
                 continue
 
-            # get the line to be set
             line = getattr(self.lines, datafield)
+            values = self.p.dataname.iloc[:, colindex].to_numpy()
+            self._colvalues.append((line, values))
 
-            # indexing for pandas: 1st is colum, then row
-            line[0] = self.p.dataname.iloc[self._idx, colindex]
+        coldtime = self._colmapping['datetime']
+        if coldtime is None:
+            # standard index in the datetime
+            self._dtnums = date2num_array(self.p.dataname.index)
+        else:
+            self._dtnums = date2num_array(
+                self.p.dataname.iloc[:, coldtime])
+
+    def __getstate__(self):
+        # The columns fetched by start are rebuilt with each start. Do not
+        # send copies of them to other processes (optimization)
+        rv = vars(self).copy()
+        rv.pop('_colvalues', None)
+        rv.pop('_dtnums', None)
+        return rv
+
+    def _load(self):
+        self._idx += 1
+
+        if self._idx >= len(self.p.dataname):
+            # exhausted all rows
+            return False
+
+        # Set the standard datafields
+        for line, values in self._colvalues:
+            line[0] = values[self._idx]
 
         # datetime conversion
+        if self._dtnums is not None:
+            self.lines.datetime[0] = self._dtnums[self._idx]
+            return True
+
         coldtime = self._colmapping['datetime']
 
         if coldtime is None:
@@ -271,3 +301,59 @@ class PandasData(feed.DataBase):
 
         # Done ... return
         return True
+
+    def preload(self):
+        if self._preloadrows() is None:
+            super(PandasData, self).preload()
+
+    def preloadchunk(self, size):
+        more = self._preloadrows(size)
+        if more is None:
+            return super(PandasData, self).preloadchunk(size)
+
+        return more
+
+    def _preloadrows(self, size=None):
+        # Without filters or input timezone, each row becomes a bar (unless
+        # discarded by fromdate/todate) and the lines can be filled at once.
+        # Fills up to size (default: all) bars and returns whether bars may
+        # remain, or None if the rows have to be loaded one by one
+        if np is None or self._dtnums is None or self._filters or \
+           self._tzinput or any(line.useislice for line in self.lines):
+            return None
+
+        try:
+            columns = [(line, np.asarray(values, dtype=np.float64))
+                       for line, values in self._colvalues]
+        except (TypeError, ValueError):
+            return None
+
+        # load discards bars before fromdate and stops at the first one
+        # after todate
+        dtnums = self._dtnums[self._idx + 1:]
+        keep = dtnums >= self.fromdate
+        stop = np.flatnonzero(keep & (dtnums > self.todate))
+        stop = stop[0] if len(stop) else len(dtnums)
+        rows = np.flatnonzero(keep[:stop])
+        more = size is not None and len(rows) > size
+        if more:
+            rows = rows[:size]
+            stop = rows[-1]
+
+        self._idx += stop + 1
+
+        if len(rows):
+            offset = len(self.p.dataname) - len(dtnums)
+            for line in self.lines:
+                line.forward(size=len(rows))
+
+            fills = [(self.lines.datetime, dtnums)]
+            fills.extend((line, values[offset:]) for line, values in columns)
+            for line, values in fills:
+                line.ndarray()[-len(rows):] = values[rows]
+
+        if not more:
+            self._last()
+
+        self.home()
+        return more
@@ -24,6 +24,11 @@ from __future__ import (absolute_import, division, print_function,
 import functools
 import math
 
+try:
+    import numpy as np
+except ImportError:
+    np = None  # only needed for the vectorized paths of "once"
+
 from .linebuffer import LineActions
 from .utils.py3 import cmp, range
 
@@ -191,10 +196,17 @@ class If(Logic):
 
 
 class MultiLogic(Logic):
+    # vectorized counterpart of flogic, taking the list of arrays to reduce
+    nplogic = None
+
     def next(self):
         self[0] = self.flogic([arg[0] for arg in self.args])
 
     def once(self, start, end):
+        if np is not None and self.nplogic is not None:
+            if self._once_np(start, end):
+                return
+
         # cache python dictionary lookups
         dst = self.array
         arrays = [arg.array for arg in self.args]
@@ -203,6 +215,15 @@ class MultiLogic(Logic):
         for i in range(start, end):
             dst[i] = flogic([arr[i] for arr in arrays])
 
+    def _once_np(self, start, end):
+        arrays = [getattr(arg, 'ndarray', lambda: None)() for arg in self.args]
+        if any(arr is None for arr in arrays):
+            return False  # constants or buffers without a view
+
+        dst = self.ndarray()
+        dst[start:end] = self.nplogic([arr[start:end] for arr in arrays])
+        return True
+
 
 class MultiLogicReduce(MultiLogic):
     def __init__(self, *args, **kwargs):
@@ -212,6 +233,7 @@ class MultiLogicReduce(MultiLogic):
         else:
             self.flogic = functools.partial(functools.reduce, self.flogic,
                                             initializer=kwargs['initializer'])
+            self.nplogic = None  # the initializer takes part in the result
 
 
 class Reduce(MultiLogicReduce):
@@ -226,16 +248,26 @@ def _andlogic(x, y):
     return bool(x and y)
 
 
+def _npandlogic(arrays):
+    return np.logical_and.reduce([arr != 0.0 for arr in arrays])
+
+
 class And(MultiLogicReduce):
     flogic = staticmethod(_andlogic)
+    nplogic = staticmethod(_npandlogic)
 
 
 def _orlogic(x, y):
     return bool(x or y)
 
 
+def _nporlogic(arrays):
+    return np.logical_or.reduce([arr != 0.0 for arr in arrays])
+
+
 class Or(MultiLogicReduce):
     flogic = staticmethod(_orlogic)
+    nplogic = staticmethod(_nporlogic)
 
 
 class Max(MultiLogic):
@@ -252,7 +284,9 @@ class Sum(MultiLogic):
 
 class Any(MultiLogic):
     flogic = any
+    nplogic = staticmethod(_nporlogic)
 
 
 class All(MultiLogic):
     flogic = all
+    nplogic = staticmethod(_npandlogic)
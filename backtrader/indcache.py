@@ -0,0 +1,412 @@
+#!/usr/bin/env python
+# -*- coding: utf-8; py-indent-offset:4 -*-
+###############################################################################
+#
+# Copyright (C) 2015-2023 Daniel Rodriguez
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+###############################################################################
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+import array
+import datetime
+import functools
+import hashlib
+import inspect
+import os
+import sys
+import tempfile
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from .feed import AbstractDataBase
+from .linebuffer import PseudoArray
+from .lineiterator import LineIterator
+from .lineroot import LineRoot
+from .lineseries import LineSeriesStub
+from .utils.py3 import integer_types, string_types
+from .version import __version__
+
+
+__all__ = ['IndicatorCache']
+
+
+class _Uncacheable(Exception):
+    pass
+
+
+# Attributes of the lines objects which hold state and not configuration
+_STATE = frozenset(['array', 'bindings', 'discarded', 'dtype', 'extension',
+                    'lencount', 'lines', 'mode', 'p', 'params', 'useislice'])
+
+_sources = dict()  # source hashes of the modules (by object)
+
+
+def _source(obj):
+    try:
+        return _sources[obj]
+    except KeyError:
+        pass
+
+    try:
+        src = inspect.getsource(obj)
+    except (OSError, TypeError):  # no source (interactive session ...)
+        raise _Uncacheable()
+
+    h = _sources[obj] = hashlib.sha1(src.encode('utf-8')).hexdigest()
+    return h
+
+
+_CORE = frozenset(['backtrader.%s' % x for x in (
+    'functions', 'indicator', 'linebuffer', 'lineiterator', 'lineroot',
+    'lineseries', 'metabase')])
+
+
+def _core():
+    # the code of the machinery which calculates the lines in runonce mode
+    # and of the indicators of the package, whose helpers (basicops ...) are
+    # shared across modules
+    modules = sorted(_CORE) + sorted(
+        x for x in sys.modules if x.startswith('backtrader.indicators.'))
+    return [__version__] + [_source(sys.modules[x]) for x in modules]
+
+
+def _modsource(obj):
+    # the code of the module of a class/function, which also covers the
+    # module level code (helpers) it calls
+    module = sys.modules.get(getattr(obj, '__module__', None) or '')
+    if module is None:
+        raise _Uncacheable()
+
+    return _source(module)
+
+
+def _name(obj):
+    return '%s.%s' % (getattr(obj, '__module__', None) or
+                      type(obj).__module__,
+                      getattr(obj, '__qualname__', obj.__name__))
+
+
+def _classsig(cls):
+    # the classes above the core ones carry the calculation
+    sig = [_name(cls)]
+    for base in cls.__mro__:
+        if base.__module__ in _CORE or base is object:
+            break  # covered by _core
+
+        src = _modsource(base)
+        if src not in sig:
+            sig.append(src)
+
+    return sig
+
+
+class IndicatorCache(object):
+    '''Cache on disk of the values calculated in runonce mode by the
+    indicators of the strategies (see the ``indcache`` parameter of
+    ``Cerebro``)
+
+    An entry holds the values of all the lines of an indicator and of the
+    objects below it (which are therefore not calculated either). The key is
+    a hash of:
+
+      - the contents of the data feeds it takes (all lines and bars, which
+        accounts for the source, the date range and the filters)
+
+      - the classes (including the source code of their modules), params
+        and inputs of the indicator and of the objects below it
+
+      - the version and the source of the calculation machinery and of the
+        indicators of the package
+
+    An indicator which cannot be keyed (for example a class or param whose
+    module has no source code, like a ``lambda`` typed in an interactive
+    session, or an object which has no stable representation) is calculated
+    as usual
+
+    Each entry is a ``.npy`` file (read memory-mapped). Entries are written
+    atomically, so several processes (optimization) can share the directory,
+    and the least recently used are removed when the files exceed ``maxsize``
+    (bytes)
+    '''
+    suffix = '.npy'
+
+    def __init__(self, path, maxsize=256 * 1024 * 1024):
+        self.path = path
+        self.maxsize = maxsize
+        self._feeds = dict()  # content hashes by data (id)
+        self._keep = list()  # hashed datas, to keep their ids in use
+
+    def _filename(self, key):
+        return os.path.join(self.path, key + self.suffix)
+
+    @staticmethod
+    def _nodes(ind):
+        # the indicator and the objects below it, in calculation order
+        nodes = [ind]
+        for child in getattr(ind, '_lineiterators', {}).get(
+                LineIterator.IndType, []):
+            nodes.extend(IndicatorCache._nodes(child))
+
+        return nodes
+
+    @staticmethod
+    def _lines(nodes):
+        return [line for node in nodes for line in node.lines]
+
+    def _feed(self, data):
+        try:
+            return self._feeds[id(data)]
+        except KeyError:
+            pass
+
+        h = hashlib.sha1()
+        for line in data.lines:
+            h.update(np.asarray(line.array, dtype=np.float64).tobytes())
+            h.update(b'|')
+
+        fp = self._feeds[id(data)] = ('feed', h.hexdigest())
+        self._keep.append(data)
+        return fp
+
+    def _value(self, val, ref):
+        # signature of a param/configuration value
+        if val is None or isinstance(val, (bool, float, integer_types,
+                                           string_types, bytes)):
+            return repr(val)
+
+        if isinstance(val, LineRoot):
+            return ref(val)
+
+        if isinstance(val, PseudoArray):  # constant of an operation
+            return ['constant', self._value(val.wrapped, ref)]
+
+        if isinstance(val, (list, tuple)):
+            return [self._value(x, ref) for x in val]
+
+        if isinstance(val, dict):
+            return sorted((repr(k), self._value(v, ref))
+                          for k, v in val.items())
+
+        if isinstance(val, (datetime.date, datetime.time,
+                            datetime.timedelta, datetime.tzinfo)):
+            return repr(val)
+
+        if np is not None and isinstance(val, np.generic):
+            return repr(val.item())
+
+        if isinstance(val, type):
+            return _classsig(val)
+
+        if isinstance(val, functools.partial):
+            return ['partial', self._value(val.func, ref),
+                    self._value(val.args, ref),
+                    self._value(val.keywords, ref)]
+
+        if inspect.isfunction(val):
+            return [_name(val), _modsource(val)]
+
+        if callable(val) and hasattr(val, '__name__'):  # builtins, ufuncs
+            name = _name(val)
+            if '<' in name:
+                raise _Uncacheable()
+
+            return name
+
+        raise _Uncacheable()
+
+    def _sig(self, obj):
+        # signature of a lines object taken as input
+        if isinstance(obj, LineSeriesStub):
+            obj = obj.lines[0]
+
+        if isinstance(obj, AbstractDataBase):
+            return self._feed(obj)
+
+        if isinstance(obj, LineIterator) or hasattr(obj, '_datas'):
+            return self._tree(obj)  # indicator/operation
+
+        # a line of a data/indicator
+        owner = getattr(obj, '_owner', None)
+        if owner is None:
+            raise _Uncacheable()
+
+        for i, line in enumerate(owner.lines):
+            if line is obj:
+                return ['line', i, self._sig(owner)]
+
+        raise _Uncacheable()
+
+    def _tree(self, ind):
+        # signature of an indicator and the objects below it. Those are
+        # referenced by position, other objects by their own signature
+        nodes = self._nodes(ind)
+        positions = dict((id(x), i) for i, x in enumerate(nodes))
+
+        def ref(obj):
+            if isinstance(obj, LineSeriesStub):
+                obj = obj.lines[0]
+
+            if id(obj) in positions:
+                return ['node', positions[id(obj)]]
+
+            owner = getattr(obj, '_owner', None)
+            if id(owner) in positions and not hasattr(obj, '_datas'):
+                lines = list(owner.lines)
+                for i, x in enumerate(lines):
+                    if x is obj:
+                        return ['node', positions[id(owner)], i]
+
+            return self._sig(obj)
+
+        sig = []
+        for node in nodes:
+            nsig = _classsig(type(node))
+            nsig.append([line.dtype for line in node.lines])
+            if isinstance(node, LineIterator):
+                nsig.append(self._value(node.p._getkwargs(), ref))
+                nsig.append([ref(x) for x in node.datas])
+            else:  # operations: configuration in the attributes
+                nsig.append(sorted(
+                    (k, self._value(v, ref)) for k, v in vars(node).items()
+                    if not k.startswith('_') and k not in _STATE))
+                nsig.append(self._value(node._tz, ref))
+
+            sig.append(nsig)
+
+        return sig
+
+    def key(self, ind):
+        '''Returns the key of the entry for the indicator or ``None`` if it
+        cannot be keyed'''
+        if np is None:
+            return None
+
+        try:
+            sig = [_core(), self._tree(ind)]
+        except _Uncacheable:
+            return None
+
+        return hashlib.sha1(repr(sig).encode('utf-8')).hexdigest()
+
+    def load(self, ind, key):
+        '''Fills the lines of the indicator and of the objects below it with
+        the values of the entry ``key``, leaving them as calculated by
+        ``_once``. Returns ``False`` if there is no (usable) entry'''
+        filename = self._filename(key)
+        try:
+            values = np.load(filename, mmap_mode='r')
+        except (OSError, ValueError):  # missing, removed or damaged
+            return False
+
+        lines = self._lines(self._nodes(ind))
+        # header: number of lines and their sizes
+        if values.ndim != 1 or not len(values) or \
+           int(values[0]) != len(lines):
+            return False
+
+        nlines = len(lines)
+        sizes = [int(x) for x in values[1:nlines + 1]]
+        if sum(sizes) + nlines + 1 != len(values):
+            return False
+
+        offset = nlines + 1
+        for line, size in zip(lines, sizes):
+            vals = values[offset:offset + size]
+            offset += size
+
+            line.forward(size=size - len(line.array))
+            ndarray = line.ndarray()
+            if ndarray is not None:
+                ndarray[0:size] = vals
+            else:
+                typecode = line.array.typecode
+                line.array[0:size] = array.array(
+                    typecode, vals.astype(typecode).tobytes())
+
+            line.home()
+
+        # the lines bound to others in the entry have the stored values, the
+        # others (outside of it) are set as ``oncebinding`` does
+        ids = set(id(line) for line in lines)
+        for line in lines:
+            blen = line.buflen()
+            for binding in line.bindings:
+                if id(binding) not in ids:
+                    line.copyvalues(binding, 0, blen)
+
+        try:
+            os.utime(filename)  # recently used
+        except OSError:
+            pass
+
+        return True
+
+    def save(self, ind, key):
+        '''Stores the values of the lines of the indicator and of the objects
+        below it as entry ``key``'''
+        lines = self._lines(self._nodes(ind))
+        arrays = [np.asarray(line.array, dtype=np.float64) for line in lines]
+        header = np.array([len(arrays)] + [len(x) for x in arrays],
+                          dtype=np.float64)
+
+        try:
+            if not os.path.isdir(self.path):
+                os.makedirs(self.path)
+
+            fd, tmpname = tempfile.mkstemp(suffix='.tmp', dir=self.path)
+            with os.fdopen(fd, 'wb') as f:
+                np.save(f, np.concatenate([header] + arrays))
+
+            os.replace(tmpname, self._filename(key))
+        except OSError:
+            return  # no cache, but the run goes on
+
+        self.evict()
+
+    def evict(self):
+        '''Removes the least recently used entries until the entries fit in
+        ``maxsize``'''
+        entries = []
+        try:
+            names = os.listdir(self.path)
+        except OSError:
+            return
+
+        for name in names:
+            if name.endswith(self.suffix):
+                filename = os.path.join(self.path, name)
+                try:
+                    st = os.stat(filename)
+                except OSError:
+                    continue  # removed by another process
+
+                entries.append((st.st_mtime, st.st_size, filename))
+
+        total = sum(x[1] for x in entries)
+        for mtime, size, filename in sorted(entries):
+            if total <= self.maxsize:
+                break
+
+            try:
+                os.remove(filename)
+            except OSError:
+                pass
+
+            total -= size
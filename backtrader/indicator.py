@@ -24,9 +24,12 @@ from __future__ import (absolute_import, division, print_function,
 
 from .utils.py3 import range, with_metaclass
 
+from .lineroot import LineRoot, LineMultiple
+from .linebuffer import cachekey
 from .lineiterator import LineIterator, IndicatorBase
 from .lineseries import LineSeriesMaker, Lines
 from .metabase import AutoInfoClass
+from . import metabase
 
 
 class MetaIndicator(IndicatorBase.__class__):
@@ -44,25 +47,70 @@ class MetaIndicator(IndicatorBase.__class__):
     def usecache(cls, onoff):
         cls._icacheuse = onoff
 
-    # Object cache deactivated on 2016-08-17. If the object is being used
-    # inside another object, the minperiod information carried over
-    # influences the first usage when being modified during the 2nd usage
+    _diskcache = None  # IndicatorCache for the values calculated with once
+
+    @classmethod
+    def usediskcache(cls, cache):
+        cls._diskcache = cache
+
+    # The cached indicator is only registered with (and therefore advanced
+    # and calculated by) the owner which created it. That owner was
+    # registered before any other owner reusing the indicator and runs before
+    # them with each bar. The other owners keep it apart (_sharedinds) to
+    # account for its minperiod and to move it along in runonce, where the
+    # indicators below the strategy level do not move with each bar and the
+    # calculations via next only move their own ones. Indicators created
+    # below an observer are not cached, because observers are not calculated
+    # in advance with runonce
+
+    def _cachekey(cls, owner, args, kwargs):
+        # datas as the indicator would take them (see MetaLineIterator.donew)
+        datas = [x for x in args if isinstance(x, LineRoot)]
+        if not datas:
+            datas = getattr(owner, 'datas', [])[:cls._mindatas] or [owner]
+
+        pkeys = cls.params._getkeys()
+        params = [(name, kwargs.get(name, default))
+                  for name, default in cls.params._getitems()]
+        others = sorted((k, v) for k, v in kwargs.items() if k not in pkeys)
+
+        return (cls, cachekey(datas), cachekey(args), cachekey(params),
+                cachekey(others))
 
     def __call__(cls, *args, **kwargs):
         if not cls._icacheuse:
             return super(MetaIndicator, cls).__call__(*args, **kwargs)
 
-        # implement a cache to avoid duplicating lines actions
-        ckey = (cls, tuple(args), tuple(kwargs.items()))  # tuples hashable
+        # reuse the indicator with the same class, inputs and params
+        owner = metabase.findowner(None, cls._OwnerCls or LineMultiple,
+                                   skip=kwargs.get('_ownerskip'))
         try:
-            return cls._icache[ckey]
+            ckey = cls._cachekey(owner, args, kwargs)
+            _obj = cls._icache[ckey][0]
         except TypeError:  # something not hashable
             return super(MetaIndicator, cls).__call__(*args, **kwargs)
         except KeyError:
             pass  # hashable but not in the cache
+        else:
+            sharedinds = getattr(owner, '_sharedinds', None)
+            if sharedinds is not None and owner is not _obj._owner and \
+               not any(x is _obj for x in sharedinds):
+                sharedinds.append(_obj)
+
+            return _obj
 
         _obj = super(MetaIndicator, cls).__call__(*args, **kwargs)
-        return cls._icache.setdefault(ckey, _obj)
+
+        o = owner
+        while o is not None:
+            if getattr(o, '_ltype', None) == LineIterator.ObsType:
+                return _obj  # below an observer, not to be reused
+
+            o = getattr(o, '_owner', None)
+
+        # the arguments are kept alive with the object, to keep their ids
+        cls._icache[ckey] = (_obj, owner, args, kwargs)
+        return _obj
 
     def __init__(cls, name, bases, dct):
         '''
@@ -92,6 +140,22 @@ class Indicator(with_metaclass(MetaIndicator, IndicatorBase)):
 
     csv = False
 
+    def _once(self):
+        # The indicators of a strategy (and what is below them) may have their
+        # values in the disk cache, saving their calculation
+        cache = self.__class__._diskcache
+        if cache is None or \
+           getattr(self._owner, '_ltype', None) != LineIterator.StratType:
+            return super(Indicator, self)._once()
+
+        key = cache.key(self)
+        if key is not None and cache.load(self, key):
+            return
+
+        super(Indicator, self)._once()
+        if key is not None:
+            cache.save(self, key)
+
     def advance(self, size=1):
         # Need intercepting this call to support datas with
         # different lengths (timeframes)
@@ -104,7 +168,8 @@ class Indicator(with_metaclass(MetaIndicator, IndicatorBase)):
             for data in self.datas:
                 data.advance()
 
-            for indicator in self._lineiterators[LineIterator.IndType]:
+            for indicator in self._lineiterators[LineIterator.IndType] + \
+                    self._sharedinds:
                 indicator.advance()
 
             self.advance()
@@ -117,7 +182,8 @@ class Indicator(with_metaclass(MetaIndicator, IndicatorBase)):
             for data in self.datas:
                 data.advance()
 
-            for indicator in self._lineiterators[LineIterator.IndType]:
+            for indicator in self._lineiterators[LineIterator.IndType] + \
+                    self._sharedinds:
                 indicator.advance()
 
             self.advance()
@@ -129,7 +195,8 @@ class Indicator(with_metaclass(MetaIndicator, IndicatorBase)):
             for data in self.datas:
                 data.advance()
 
-            for indicator in self._lineiterators[LineIterator.IndType]:
+            for indicator in self._lineiterators[LineIterator.IndType] + \
+                    self._sharedinds:
                 indicator.advance()
 
             self.advance()
@@ -21,15 +21,202 @@
 from __future__ import (absolute_import, division, print_function,
                         unicode_literals)
 
+import collections
 import functools
+import itertools
 import math
 import operator
 
+try:
+    import numpy as np
+    from numpy.lib.stride_tricks import sliding_window_view
+except ImportError:
+    np = None
+
 from ..utils.py3 import map, range
 
 from . import Indicator
 
 
+# Array-native counterparts of the "once" loops. They take the source values
+# from "start - period + 1" up to "end" and return the "end - start" results,
+# or None when the input holds values (nan, inf) for which the scalar code
+# paths have a behavior of their own. In that case the loops are used
+
+# Number of windows processed at once, to limit the size of intermediate
+# arrays, and after which running sums are restarted
+_NPCHUNK = 512
+_NPSUMCHUNK = 64
+
+
+def _npwindows(a, period):
+    for i in range(0, len(a) - period + 1, _NPCHUNK):
+        yield i, sliding_window_view(a[i:i + _NPCHUNK + period - 1], period)
+
+
+def _npsumn(a, period):
+    # Running sums restarted (and re-centered on the first value) every few
+    # windows. This corrects the drift of a single cumulative sum along the
+    # data, keeping the results in line with those of math.fsum
+    if not np.isfinite(a).all():
+        return None
+
+    chunk = max(period, _NPSUMCHUNK)
+    out = np.empty(len(a) - period + 1)
+    for i in range(0, len(out), chunk):
+        seg = a[i:i + chunk + period - 1]
+        cs = np.cumsum(seg - seg[0])
+        sums = out[i:i + chunk]
+        sums[:] = cs[period - 1:]
+        sums[1:] -= cs[:-period]
+        sums += period * seg[0]
+
+    return out
+
+
+def _npcountn(a, period):
+    # number of non-zero values per window (nan counts as non-zero like bool)
+    cs = np.concatenate(([0], np.cumsum(a != 0.0)))
+    return cs[period:] - cs[:-period]
+
+
+def _npreducen(a, period, func):
+    if np.isnan(a).any():  # max/min are order dependent with nan
+        return None
+
+    out = np.empty(len(a) - period + 1)
+    for i, w in _npwindows(a, period):
+        func(w, axis=1, out=out[i:i + len(w)])
+
+    return out
+
+
+def _npfindindex(a, period, func, first):
+    if func not in (max, min) or np.isnan(a).any():
+        return None
+
+    func = np.max if func is max else np.min
+    out = np.empty(len(a) - period + 1)
+    for i, w in _npwindows(a, period):
+        eq = w == func(w, axis=1)[:, None]
+        if first:  # look from the end of the window
+            out[i:i + len(w)] = np.argmax(eq[:, ::-1], axis=1)
+        else:
+            out[i:i + len(w)] = period - 1 - np.argmax(eq, axis=1)
+
+    return out
+
+
+class _RunningWindow(object):
+    '''
+    Incremental state for the calculation over a window of ``period`` values
+    in "next" mode, making the cost of each call independent of the period
+
+    The state covers the ``period - 1`` values preceding the current one.
+    Those no longer change once the data has moved forward and the current
+    value can therefore be updated as often as needed (replay, datas with
+    different timeframes) by combining it with the state
+
+    The state is recalculated from scratch if the data has not moved exactly
+    one step forward and each time the window has been completely renewed,
+    to keep rounding errors from accumulating
+
+    Subclasses implement ``recalc``, ``advance`` and ``value``
+    '''
+    def __init__(self, period):
+        self.period = period
+        self.past = collections.deque(maxlen=period - 1)
+        self.length = None  # length of the data for the current state
+        self.steps = 0  # forward steps since the last recalculation
+
+    def __call__(self, data):
+        '''Returns the value of the window ending at ``data[0]``'''
+        data = data.lines[0]
+        length = len(data)
+        if length != self.length:
+            if self.length is not None and length == self.length + 1 and \
+               self.steps < self.period - 1:
+                value = data[-1]  # the previous current value is now past
+                self.advance(value, self.past[0])
+                self.past.append(value)
+                self.steps += 1
+            else:
+                if self.period > 1:
+                    self.past.clear()
+                    self.past.extend(data.get(ago=-1, size=self.period - 1))
+
+                self.recalc()
+                self.steps = 0
+
+            self.length = length
+
+        return self.value(data[0])
+
+    def recalc(self):
+        '''Calculates the state from the values in ``past``'''
+        raise NotImplementedError
+
+    def advance(self, new, old):
+        '''Updates the state when ``new`` enters and ``old`` leaves'''
+        raise NotImplementedError
+
+    def value(self, current):
+        '''Combines the state with the current value'''
+        raise NotImplementedError
+
+
+class _RunningSum(_RunningWindow):
+    def recalc(self):
+        self.sum = math.fsum(self.past)
+
+    def advance(self, new, old):
+        if math.isfinite(new) and math.isfinite(old):
+            self.sum += new - old
+        else:
+            # a nan (or inf) would stay in the sum after leaving the window
+            self.sum = math.fsum(
+                itertools.chain(itertools.islice(self.past, 1, None), (new,)))
+
+    def value(self, current):
+        return self.sum + current
+
+
+class _RunningMax(_RunningWindow):
+    # Monotonic deque of (position, value) pairs. Values which can no longer
+    # be the result (an equal or better one came later) are discarded
+    better = operator.gt
+
+    def recalc(self):
+        self.pos = -1
+        self.candidates = collections.deque()
+        for value in self.past:
+            self.add(value)
+
+    def add(self, value):
+        self.pos += 1
+        candidates, better = self.candidates, self.better
+        while candidates and not better(candidates[-1][1], value):
+            candidates.pop()
+
+        candidates.append((self.pos, value))
+
+    def advance(self, new, old):
+        self.add(new)
+        if self.candidates[0][0] <= self.pos - len(self.past):
+            self.candidates.popleft()
+
+    def value(self, current):
+        if not self.candidates:
+            return current
+
+        best = self.candidates[0][1]
+        return current if self.better(current, best) else best
+
+
+class _RunningMin(_RunningMax):
+    better = operator.lt
+
+
 class PeriodN(Indicator):
     '''
     Base class for indicators which take a period (__init__ has to be called
@@ -54,13 +241,33 @@ class OperationN(PeriodN):
     Note:
       Base classes must provide a "func" attribute which is a callable
 
+    Subclasses can provide an array-native version of "func" in "npfunc",
+    which takes the source ``numpy`` array and the period and returns the
+    values or ``None`` to fall back to "func", and an incremental one for
+    "next" in "running" (a ``_RunningWindow`` subclass)
+
     Formula:
       - line = func(data, period)
     '''
+    npfunc = None
+    running = None
+
+    def __init__(self):
+        super(OperationN, self).__init__()
+        if self.running is not None:
+            self._running = self.running(self.p.period)
+
     def next(self):
-        self.line[0] = self.func(self.data.get(size=self.p.period))
+        if self.running is not None:
+            self.line[0] = self._running(self.data)
+        else:
+            self.line[0] = self.func(self.data.get(size=self.p.period))
 
     def once(self, start, end):
+        if np is not None and self.npfunc is not None and \
+           self._once_np(start, end):
+            return
+
         dst = self.line.array
         src = self.data.array
         period = self.p.period
@@ -69,6 +276,19 @@ class OperationN(PeriodN):
         for i in range(start, end):
             dst[i] = func(src[i - period + 1: i + 1])
 
+    def _once_np(self, start, end):
+        dst, src = self.line.ndarray(), self.data.ndarray()
+        if dst is None or src is None:
+            return False
+
+        period = self.p.period
+        res = self.npfunc(src[start - period + 1:end], period)
+        if res is None:
+            return False
+
+        dst[start:end] = res
+        return True
+
 
 class BaseApplyN(OperationN):
     '''
@@ -112,6 +332,10 @@ class Highest(OperationN):
     alias = ('MaxN',)
     lines = ('highest',)
     func = max
+    running = _RunningMax
+
+    def npfunc(self, a, period):
+        return _npreducen(a, period, np.max)
 
 
 class Lowest(OperationN):
@@ -126,6 +350,10 @@ class Lowest(OperationN):
     alias = ('MinN',)
     lines = ('lowest',)
     func = min
+    running = _RunningMin
+
+    def npfunc(self, a, period):
+        return _npreducen(a, period, np.min)
 
 
 class ReduceN(OperationN):
@@ -170,6 +398,10 @@ class SumN(OperationN):
     '''
     lines = ('sumn',)
     func = math.fsum
+    running = _RunningSum
+
+    def npfunc(self, a, period):
+        return _npsumn(a, period)
 
 
 class AnyN(OperationN):
@@ -185,6 +417,9 @@ class AnyN(OperationN):
     lines = ('anyn',)
     func = any
 
+    def npfunc(self, a, period):
+        return _npcountn(a, period) > 0
+
 
 class AllN(OperationN):
     '''
@@ -199,6 +434,9 @@ class AllN(OperationN):
     lines = ('alln',)
     func = all
 
+    def npfunc(self, a, period):
+        return _npcountn(a, period) == period
+
 
 class FindFirstIndex(OperationN):
     '''
@@ -219,6 +457,9 @@ class FindFirstIndex(OperationN):
         m = self.p._evalfunc(iterable)
         return next(i for i, v in enumerate(reversed(iterable)) if v == m)
 
+    def npfunc(self, a, period):
+        return _npfindindex(a, period, self.p._evalfunc, first=True)
+
 
 class FindFirstIndexHighest(FindFirstIndex):
     '''
@@ -271,6 +512,9 @@ class FindLastIndex(OperationN):
         # period - index = 1 ... and must be zero!
         return self.p.period - index - 1
 
+    def npfunc(self, a, period):
+        return _npfindindex(a, period, self.p._evalfunc, first=False)
+
 
 class FindLastIndexHighest(FindLastIndex):
     '''
@@ -351,11 +595,17 @@ class Average(PeriodN):
     alias = ('ArithmeticMean', 'Mean',)
     lines = ('av',)
 
+    def __init__(self):
+        super(Average, self).__init__()
+        self._running = _RunningSum(self.p.period)
+
     def next(self):
-        self.line[0] = \
-            math.fsum(self.data.get(size=self.p.period)) / self.p.period
+        self.line[0] = self._running(self.data) / self.p.period
 
     def once(self, start, end):
+        if np is not None and self._once_np(start, end):
+            return
+
         src = self.data.array
         dst = self.line.array
         period = self.p.period
@@ -363,6 +613,19 @@ class Average(PeriodN):
         for i in range(start, end):
             dst[i] = math.fsum(src[i - period + 1:i + 1]) / period
 
+    def _once_np(self, start, end):
+        dst, src = self.line.ndarray(), self.data.ndarray()
+        if dst is None or src is None:
+            return False
+
+        period = self.p.period
+        sums = _npsumn(src[start - period + 1:end], period)
+        if sums is None:
+            return False
+
+        dst[start:end] = sums / period
+        return True
+
 
 class ExponentialSmoothing(Average):
     '''
@@ -380,6 +643,8 @@ class ExponentialSmoothing(Average):
     alias = ('ExpSmoothing',)
     params = (('alpha', None),)
 
+    _NPBLOCK = 64  # block size for the array-native calculation
+
     def __init__(self):
         self.alpha = self.p.alpha
         if self.alpha is None:
@@ -401,6 +666,9 @@ class ExponentialSmoothing(Average):
         super(ExponentialSmoothing, self).once(start, end)
 
     def once(self, start, end):
+        if np is not None and self._once_smoothing_np(start, end):
+            return
+
         darray = self.data.array
         larray = self.line.array
         alpha = self.alpha
@@ -411,6 +679,42 @@ class ExponentialSmoothing(Average):
         for i in range(start, end):
             larray[i] = prev = prev * alpha1 + darray[i] * alpha
 
+    def _once_smoothing_np(self, start, end):
+        # The recursion is a linear filter. Over a block of values it is
+        #   av[j] = alpha1 ** (j + 1) * prev +
+        #           sum(alpha * alpha1 ** (j - k) * data[k] for k <= j)
+        # which is a matrix product. Blocks are kept short for the powers of
+        # alpha1 to stay well away from underflow and the last value of each
+        # block seeds the next one
+        alpha, alpha1 = self.alpha, self.alpha1
+        if not 0.0 <= alpha1 < 1.0:
+            return False
+
+        larray, darray = self.line.ndarray(), self.data.ndarray()
+        if larray is None or darray is None:
+            return False
+
+        src = darray[start:end]
+        if not len(src):
+            return True
+
+        prev = larray[start - 1]
+        if not (math.isfinite(prev) and np.isfinite(src).all()):
+            return False  # nan/inf would leak into earlier values of a block
+
+        n = min(self._NPBLOCK, len(src))
+        exps = np.subtract.outer(np.arange(n), np.arange(n))
+        filt = np.where(exps >= 0, alpha * alpha1 ** np.maximum(exps, 0), 0.0)
+        decay = alpha1 ** np.arange(1, n + 1)
+
+        for i in range(start, end, n):
+            block = darray[i:i + n]
+            m = len(block)
+            larray[i:i + m] = filt[:m, :m].dot(block) + decay[:m] * prev
+            prev = larray[i + m - 1]
+
+        return True
+
 
 class ExponentialSmoothingDynamic(ExponentialSmoothing):
     '''
@@ -483,6 +787,9 @@ class WeightedAverage(PeriodN):
         self.line[0] = self.p.coef * math.fsum(dataweighted)
 
     def once(self, start, end):
+        if np is not None and self._once_np(start, end):
+            return
+
         darray = self.data.array
         larray = self.line.array
         period = self.p.period
@@ -492,3 +799,22 @@ class WeightedAverage(PeriodN):
         for i in range(start, end):
             data = darray[i - period + 1: i + 1]
             larray[i] = coef * math.fsum(map(operator.mul, data, weights))
+
+    def _once_np(self, start, end):
+        period = self.p.period
+        if len(self.p.weights) != period:
+            return False  # map would silently stop at the shortest
+
+        larray, darray = self.line.ndarray(), self.data.ndarray()
+        if larray is None or darray is None:
+            return False
+
+        src = darray[start - period + 1:end]
+        if not np.isfinite(src).all():
+            return False
+
+        # the weights are applied from oldest to newest: reverse the kernel
+        weights = np.asarray(self.p.weights, dtype=float)[::-1]
+        larray[start:end] = \
+            self.p.coef * np.convolve(src, weights, mode='valid')
+        return True
@@ -21,6 +21,11 @@
 from __future__ import (absolute_import, division, print_function,
                         unicode_literals)
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 from . import Indicator, And
 
 
@@ -49,6 +54,9 @@ class NonZeroDifference(Indicator):
             self.data0.array[start] - self.data1.array[start])
 
     def once(self, start, end):
+        if np is not None and self._once_np(start, end):
+            return
+
         d0array = self.data0.array
         d1array = self.data1.array
         larray = self.line.array
@@ -58,6 +66,19 @@ class NonZeroDifference(Indicator):
             d = d0array[i] - d1array[i]
             larray[i] = prev = d if d else prev
 
+    def _once_np(self, start, end):
+        d0array, d1array = self.data0.ndarray(), self.data1.ndarray()
+        larray = self.line.ndarray()
+        if d0array is None or d1array is None or larray is None:
+            return False
+
+        d = d0array[start:end] - d1array[start:end]
+        # index of the last non zero difference (-1 if none yet)
+        last = np.where(d != 0.0, np.arange(len(d)), -1)
+        np.maximum.accumulate(last, out=last)
+        larray[start:end] = np.where(last >= 0, d[last], larray[start - 1])
+        return True
+
 
 class _CrossBase(Indicator):
     _mindatas = 2
@@ -34,19 +34,312 @@ from __future__ import (absolute_import, division, print_function,
 import array
 import collections
 import datetime
+import itertools
+import functools
 from itertools import islice
 import math
+import operator
 
-from .utils.py3 import range, with_metaclass, string_types
+try:
+    import numpy as np
+except ImportError:
+    np = None  # only needed for the "numpy" line storage
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:
+    shared_memory = None  # python < 3.8
+
+from .utils.py3 import range, with_metaclass, string_types, zip
+from .errors import ModuleImportError
 
 from .lineroot import LineRoot, LineSingle, LineMultiple
 from . import metabase
-from .utils import num2date, time2num
+from .utils import num2date, num2date_array, time2num
 
 
 NAN = float('NaN')
 
 
+# Operations which can be carried out in "once" mode over an entire range in a
+# single call, because the numpy ufunc delivers the same result as the python
+# operator applied to each pair of floats
+_NPOPS = dict()
+_NPOPSOWN = dict()
+
+if np is not None:
+    _NPOPS.update({
+        operator.add: np.add,
+        operator.sub: np.subtract,
+        operator.mul: np.multiply,
+        operator.truediv: np.true_divide,
+        operator.floordiv: np.floor_divide,
+        operator.pow: np.power,
+        operator.lt: np.less,
+        operator.le: np.less_equal,
+        operator.gt: np.greater,
+        operator.ge: np.greater_equal,
+        operator.eq: np.equal,
+        operator.ne: np.not_equal,
+    })
+
+    _NPOPSOWN.update({
+        operator.abs: np.absolute,
+        operator.neg: np.negative,
+        bool: functools.partial(np.not_equal, 0.0),  # bool(nan) is True
+    })
+
+
+def _npoperation(op, a, b):
+    '''Applies the operation ``op`` to ``a`` and ``b`` (numpy arrays of the
+    same length or python numbers) and returns the resulting array.
+
+    ``None`` is returned if the operation cannot be vectorized or if python
+    would have not delivered a float for any of the pairs (a division by zero
+    raises an exception, a power may end up being a complex or overflow). The
+    scalar path has to be taken in that case, to keep the behavior.
+    '''
+    ufunc = _NPOPS.get(op)
+    if ufunc is None:
+        return None
+
+    if op in (operator.truediv, operator.floordiv) and not np.all(b):
+        return None  # ZeroDivisionError has to be raised by python
+
+    with np.errstate(all='ignore'):
+        res = ufunc(a, b)
+
+    if op is operator.pow:
+        finite = np.isfinite(a) & np.isfinite(b)
+        if np.any(finite & ~np.isfinite(res)):
+            return None  # complex results, 0 ** -x or overflow
+
+    return res
+
+
+class NumpyStorage(object):
+    '''
+    Growable storage on top of a preallocated ``numpy.ndarray`` which
+    implements the subset of the ``array.array`` interface used by
+    LineBuffer (append, extend, pop, len, indexing and slicing)
+
+    The values occupy the leading positions of the ndarray. The capacity is
+    doubled when exhausted, which keeps ``append`` amortized O(1) and allows
+    handing out zero-copy views of the values with ``ndarray``
+
+    Notes:
+
+      - Single items are returned as python ``float`` to keep the semantics
+        of ``array.array`` (ex: ``ZeroDivisionError`` in operations)
+
+      - Slices are returned as ``numpy.ndarray`` views
+
+      - Views are only valid until the storage has to grow
+    '''
+    MINSIZE = 256
+
+    def __init__(self, size=0, dtype='d'):
+        self._buf = np.empty(max(size, self.MINSIZE), dtype=dtype)
+        self._len = 0
+
+    @property
+    def ndarray(self):
+        return self._buf[:self._len]
+
+    @property
+    def dtype(self):
+        return self._buf.dtype
+
+    def reserve(self, size):
+        '''Makes sure at least ``size`` values can be held without growing'''
+        if size > len(self._buf):
+            buf = np.empty(max(size, 2 * len(self._buf)), dtype=self._buf.dtype)
+            buf[:self._len] = self._buf[:self._len]
+            self._buf = buf
+
+    def __len__(self):
+        return self._len
+
+    def __iter__(self):
+        return iter(self.tolist())
+
+    def __array__(self, dtype=None, copy=None):
+        if dtype is None:
+            return self.ndarray
+
+        return self.ndarray.astype(dtype)
+
+    def __getstate__(self):
+        # do not transport the unused capacity (multiprocessing)
+        return dict(_buf=self.ndarray.copy(), _len=self._len)
+
+    def __repr__(self):
+        return '%s(%r)' % (self.__class__.__name__, self.tolist())
+
+    def tolist(self):
+        return self.ndarray.tolist()
+
+    def append(self, value):
+        if self._len == len(self._buf):
+            self.reserve(self._len + 1)
+
+        self._buf[self._len] = value
+        self._len += 1
+
+    def extend(self, values):
+        if not hasattr(values, '__len__'):
+            values = np.fromiter(values, dtype=self._buf.dtype)
+
+        size = len(values)
+        self.reserve(self._len + size)
+        self._buf[self._len:self._len + size] = values
+        self._len += size
+
+    def pop(self):
+        if not self._len:
+            raise IndexError('pop from empty array')
+
+        self._len -= 1
+        return self._buf.item(self._len)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return self._buf[:self._len][key]
+
+        if key < 0:
+            key += self._len
+
+        if not 0 <= key < self._len:
+            raise IndexError('array index out of range')
+
+        return self._buf.item(key)
+
+    def __setitem__(self, key, value):
+        if isinstance(key, slice):
+            self._buf[:self._len][key] = value
+            return
+
+        if key < 0:
+            key += self._len
+
+        if not 0 <= key < self._len:
+            raise IndexError('array assignment index out of range')
+
+        self._buf[key] = value
+
+    def __delitem__(self, key):
+        values = np.delete(self.ndarray, key)
+        self._len = len(values)
+        self._buf[:self._len] = values
+
+
+class SharedStorage(NumpyStorage):
+    '''
+    ``NumpyStorage`` whose values live in a block of
+    ``multiprocessing.shared_memory``
+
+    Pickling carries only the name of the block and the position of the
+    values in it and unpickling attaches to the block without copying, which
+    allows handing large buffers to other processes. Values written are seen
+    by all processes. Growing the storage moves the values to private memory
+
+    ``publish`` moves the values of a group of buffers to a new block and
+    ``withdraw`` undoes it
+    '''
+    _blocks = dict()  # blocks attached to by this process, by name
+
+    def __init__(self, shm, offset, size, dtype='d'):
+        self._shm = shm
+        self._offset = offset
+        self._buf = np.ndarray(size, dtype=dtype, buffer=shm.buf,
+                               offset=offset)
+        self._len = size
+
+    def reserve(self, size):
+        if size > len(self._buf):
+            super(SharedStorage, self).reserve(size)
+            self._shm = None  # no longer in the block
+
+    def __getstate__(self):
+        if self._shm is None:
+            return super(SharedStorage, self).__getstate__()
+
+        return dict(name=self._shm.name, offset=self._offset,
+                    size=len(self._buf), dtype=self._buf.dtype.str,
+                    length=self._len)
+
+    def __setstate__(self, state):
+        if 'name' not in state:
+            self.__dict__.update(state)
+            self._shm = None
+            return
+
+        name = state['name']
+        shm = self._blocks.get(name)
+        if shm is None:
+            shm = shared_memory.SharedMemory(name=name)
+            self._blocks[name] = shm
+
+        self.__init__(shm, state['offset'], state['size'], state['dtype'])
+        self._len = state['length']
+
+    @classmethod
+    def publish(cls, lines):
+        '''
+        Moves the values of the given ``LineBuffer`` instances (which must be
+        in UnBounded mode) to a single new shared memory block
+
+        Returns the block and the previous storages to be given to
+        ``withdraw``
+        '''
+        if np is None or shared_memory is None:
+            raise ModuleImportError('numpy and multiprocessing.shared_memory '
+                                    'are needed for shared storage')
+
+        values = [np.asarray(line.array) for line in lines]
+        offsets, size = [], 0
+        for v in values:
+            offsets.append(size)
+            size += -(-v.nbytes // 8) * 8  # keep the offsets aligned
+
+        shm = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        cls._blocks[shm.name] = shm
+
+        previous = []
+        for line, v, offset in zip(lines, values, offsets):
+            storage = cls(shm, offset, len(v), v.dtype)
+            storage.ndarray[:] = v
+            previous.append(line.array)
+            line.array = storage
+
+        return shm, previous
+
+    @classmethod
+    def withdraw(cls, lines, shm, previous):
+        '''
+        Puts back the storages replaced by ``publish`` and releases the block
+
+        The block is not closed explicitly: numpy does not lock the memory it
+        is given, and storages unpickled from the block in this process (like
+        those of returned strategies) would be left dangling. Each storage
+        keeps a reference to the block, which is unmapped when the last of
+        them is gone
+        '''
+        for line, storage in zip(lines, previous):
+            line.array = storage
+
+        shm.unlink()
+        cls._blocks.pop(shm.name, None)
+
+    @classmethod
+    def detach(cls):
+        '''
+        Forgets the blocks attached to by unpickling. Each of them is unmapped
+        when the last of its storages is gone
+        '''
+        cls._blocks.clear()
+
+
 class LineBuffer(LineSingle):
     '''
     LineBuffer defines an interface to an "array.array" (or list) in which
@@ -68,11 +361,43 @@ class LineBuffer(LineSingle):
     The class can also hold "bindings" to other LineBuffers. When a value
     is set in this class
     it will also be set in the binding.
+
+    ``dtype`` is the typecode of the values in UnBounded mode: ``d``
+    (double, the default) or ``f`` (float32, half the memory). Values are
+    always read back as python ``float``. Integer types are not supported,
+    because missing values are ``NaN``
     '''
 
     UnBounded, QBuffer = (0, 1)
 
-    def __init__(self):
+    DTypes = ('d', 'f')
+
+    _dtmemo = (None, None, None, None)  # last conversion of _num2date
+
+    # Storage used for the UnBounded mode: 'array' (array.array) or 'numpy'
+    _storage = 'array'
+
+    @classmethod
+    def usestorage(cls, storage):
+        '''Sets the storage used by buffers created/reset from now on in
+        UnBounded mode
+
+          - ``array``: a standard ``array.array`` (of ``dtype``)
+          - ``numpy``: a preallocated and growable ``numpy.ndarray``
+        '''
+        if storage not in ('array', 'numpy'):
+            raise ValueError('Unknown line storage: %s' % storage)
+
+        if storage == 'numpy' and np is None:
+            raise ModuleImportError('numpy is needed for the numpy storage')
+
+        LineBuffer._storage = storage
+
+    def __init__(self, dtype='d'):
+        if dtype not in self.DTypes:
+            raise ValueError('Unsupported line dtype: %s' % (dtype,))
+
+        self.dtype = dtype
         self.lines = [self]
         self.mode = self.UnBounded
         self.bindings = list()
@@ -110,13 +435,18 @@ class LineBuffer(LineSingle):
             # allows the forward without removing that bar
             self.array = collections.deque(maxlen=self.maxlen + self.extrasize)
             self.useislice = True
+        elif self._storage == 'numpy':
+            self.array = NumpyStorage(dtype=self.dtype)
+            self.useislice = False
         else:
-            self.array = array.array(str('d'))
+            self.array = array.array(str(self.dtype))
             self.useislice = False
 
         self.lencount = 0
         self.idx = -1
         self.extension = 0
+        self.discarded = 0  # values removed from the start with discard
+        self._home = (-1, 0)  # idx, lencount
 
     def qbuffer(self, savemem=0, extrasize=0):
         self.mode = self.QBuffer
@@ -162,6 +492,27 @@ class LineBuffer(LineSingle):
     def __getitem__(self, ago):
         return self.array[self.idx + ago]
 
+    def ndarray(self):
+        ''' Returns a ``numpy.ndarray`` which shares the memory of the
+        underlying buffer, from the real zero of the buffer up to the last
+        position (including any extension). Indices into the returned object
+        are therefore the same as those used in the ``once`` methods
+
+        ``None`` is returned if ``numpy`` is not available or if the buffer is
+        in QBuffer mode
+
+        With the ``array.array`` storage the buffer cannot change its size
+        while the view is alive. The view must not be kept beyond the
+        operation at hand
+        '''
+        if np is None or self.useislice:
+            return None
+
+        if isinstance(self.array, NumpyStorage):
+            return self.array.ndarray
+
+        return np.frombuffer(self.array, dtype=self.array.typecode)
+
     def get(self, ago=0, size=1):
         ''' Returns a slice of the array relative to *ago*
 
@@ -236,13 +587,32 @@ class LineBuffer(LineSingle):
             binding[ago] = value
 
     def home(self):
-        ''' Rewinds the logical index to the beginning
+        ''' Rewinds the logical index to the beginning (or to the position
+        set with ``sethome``)
 
         The underlying buffer remains untouched and the actual len can be found
         out with buflen
         '''
-        self.idx = -1
-        self.lencount = 0
+        self.idx, self.lencount = self._home
+
+    def sethome(self):
+        ''' Makes the current position the one ``home`` rewinds to
+
+        Used to calculate in ``once`` mode only the values added after it
+        '''
+        self._home = (self._idx, self.lencount)
+
+    def discard(self, size):
+        ''' Removes ``size`` values from the beginning of the buffer
+
+        ``len`` is not affected: it keeps counting the values from the real
+        beginning. The amount of removed values is kept in ``discarded``
+        '''
+        del self.array[:size]
+        self._idx -= size
+        self.discarded += size
+        idx, lencount = self._home
+        self._home = (max(idx - size, -1), lencount)
 
     def forward(self, value=NAN, size=1):
         ''' Moves the logical index foward and enlarges the buffer as much as needed
@@ -254,8 +624,10 @@ class LineBuffer(LineSingle):
         self.idx += size
         self.lencount += size
 
-        for i in range(size):
+        if size == 1:
             self.array.append(value)
+        else:
+            self.array.extend(itertools.repeat(value, size))
 
     def backwards(self, size=1, force=False):
         ''' Moves the logical index backwards and reduces the buffer as much as needed
@@ -280,7 +652,11 @@ class LineBuffer(LineSingle):
         Keyword Args:
             size (int): How many extra positions to move forward
         '''
-        self.idx += size
+        if self.mode == self.QBuffer:
+            self.idx += size
+        else:  # the idx setter would do the same (called with each bar)
+            self._idx += size
+
         self.lencount += size
 
     def extend(self, value=NAN, size=0):
@@ -294,8 +670,7 @@ class LineBuffer(LineSingle):
         set values in the buffer "future"
         '''
         self.extension += size
-        for i in range(size):
-            self.array.append(value)
+        self.array.extend(itertools.repeat(value, size))
 
     def addbinding(self, binding):
         ''' Adds another line binding
@@ -331,14 +706,25 @@ class LineBuffer(LineSingle):
 
         return self.array[start:end]
 
-    def oncebinding(self):
+    def oncebinding(self, start=0):
         '''
-        Executes the bindings when running in "once" mode
+        Executes the bindings when running in "once" mode (for the values
+        from position ``start`` of the buffer)
         '''
-        larray = self.array
         blen = self.buflen()
         for binding in self.bindings:
-            binding.array[0:blen] = larray[0:blen]
+            self.copyvalues(binding, start, blen)
+
+    def copyvalues(self, line, start, end):
+        '''
+        Copies the values from position ``start`` to ``end`` of the buffer
+        to the same positions of ``line``, which may have another ``dtype``
+        '''
+        values = self.array[start:end]
+        if line.dtype != self.dtype and isinstance(values, array.array):
+            values = array.array(str(line.dtype), values)
+
+        line.array[start:end] = values
 
     def bind2lines(self, binding=0):
         '''
@@ -383,17 +769,28 @@ class LineBuffer(LineSingle):
     def _settz(self, tz):
         self._tz = tz
 
+    def _num2date(self, x, tz, naive):
+        # The same bar is usually converted several times (strategy logs,
+        # analyzers, broker ...): keep the last conversion
+        memo = self._dtmemo
+        if memo[0] == x and memo[1] is tz and memo[2] == naive:
+            return memo[3]
+
+        dt = num2date(x, tz=tz, naive=naive)
+        self._dtmemo = (x, tz, naive, dt)
+        return dt
+
     def datetime(self, ago=0, tz=None, naive=True):
-        return num2date(self.array[self.idx + ago],
-                        tz=tz or self._tz, naive=naive)
+        return self._num2date(self.array[self.idx + ago],
+                              tz or self._tz, naive)
 
     def date(self, ago=0, tz=None, naive=True):
-        return num2date(self.array[self.idx + ago],
-                        tz=tz or self._tz, naive=naive).date()
+        return self._num2date(self.array[self.idx + ago],
+                              tz or self._tz, naive).date()
 
     def time(self, ago=0, tz=None, naive=True):
-        return num2date(self.array[self.idx + ago],
-                        tz=tz or self._tz, naive=naive).time()
+        return self._num2date(self.array[self.idx + ago],
+                              tz or self._tz, naive).time()
 
     def dt(self, ago=0):
         '''
@@ -417,7 +814,8 @@ class LineBuffer(LineSingle):
         # To avoid precision errors, this returns the fractional part after
         # having converted it to a datetime.time object to avoid precision
         # errors in comparisons
-        return time2num(num2date(self.array[self.idx + ago]).time())
+        return time2num(
+            self._num2date(self.array[self.idx + ago], None, True).time())
 
     def tm_lt(self, other, ago=0):
         '''
@@ -496,6 +894,37 @@ class LineBuffer(LineSingle):
         return num2date(int(self.array[self.idx + ago]) + tm)
 
 
+def cachekey(values):
+    '''
+    Returns a hashable key for the values (arguments of a lines object) for
+    the object caches, with lines objects by identity, because they overload
+    the comparison operators
+    '''
+    return tuple(cachekey(x) if isinstance(x, tuple) else
+                 ('line', id(x)) if isinstance(x, LineRoot) else x
+                 for x in values)
+
+
+def oncecalls(obj, start, end, minperiod):
+    '''
+    Calls ``preonce``, ``oncestart`` and ``once`` of ``obj`` to calculate the
+    positions ``start`` to ``end`` of its buffer, splitting them at the
+    minimum period (counted from the beginning of the buffer). Empty ranges
+    are not called
+
+    ``start`` is ``0`` unless the buffer already held calculated values
+    (chunked runonce, see ``Cerebro``)
+    '''
+    pre = min(max(start, minperiod - 1), end)
+    post = min(max(start, minperiod), end)
+    if start < pre:
+        obj.preonce(start, pre)
+    if pre < post:
+        obj.oncestart(pre, post)
+    if post < end:
+        obj.once(post, end)
+
+
 class MetaLineActions(LineBuffer.__class__):
     '''
     Metaclass for Lineactions
@@ -521,17 +950,23 @@ class MetaLineActions(LineBuffer.__class__):
         if not cls._acacheuse:
             return super(MetaLineActions, cls).__call__(*args, **kwargs)
 
-        # implement a cache to avoid duplicating lines actions
-        ckey = (cls, tuple(args), tuple(kwargs.items()))  # tuples hashable
+        # implement a cache to avoid duplicating lines actions. Actions are
+        # only reused by their owner: they are advanced by it and the lines
+        # bound to them (line assignments) must move along with them
+        owner = metabase.findowner(None, cls._OwnerCls or LineMultiple,
+                                   skip=kwargs.get('_ownerskip'))
+        ckey = (cls, id(owner), cachekey(args), cachekey(kwargs.items()))
         try:
-            return cls._acache[ckey]
+            return cls._acache[ckey][0]
         except TypeError:  # something not hashable
             return super(MetaLineActions, cls).__call__(*args, **kwargs)
         except KeyError:
             pass  # hashable but not in the cache
 
         _obj = super(MetaLineActions, cls).__call__(*args, **kwargs)
-        return cls._acache.setdefault(ckey, _obj)
+        # the arguments are kept alive with the object, to keep their ids
+        cls._acache[ckey] = (_obj, owner, args, kwargs)
+        return _obj
 
     def dopreinit(cls, _obj, *args, **kwargs):
         _obj, args, kwargs = \
@@ -623,14 +1058,13 @@ class LineActions(with_metaclass(MetaLineActions, LineBuffer)):
             self.prenext()
 
     def _once(self):
-        self.forward(size=self._clock.buflen())
+        start = self.buflen()  # only values beyond it are calculated
+        self.forward(size=self._clock.buflen() - start)
         self.home()
 
-        self.preonce(0, self._minperiod - 1)
-        self.oncestart(self._minperiod - 1, self._minperiod)
-        self.once(self._minperiod, self.buflen())
+        oncecalls(self, start, self.buflen(), self._minperiod - self.discarded)
 
-        self.oncebinding()
+        self.oncebinding(start)
 
 
 def LineDelay(a, ago=0, **kwargs):
@@ -663,10 +1097,16 @@ class _LineDelay(LineActions):
         self[0] = self.a[self.ago]
 
     def once(self, start, end):
+        ago = self.ago
+        if isinstance(self.a, LineBuffer):
+            dst, src = self.ndarray(), self.a.ndarray()
+            if dst is not None and src is not None:
+                dst[start:end] = src[start + ago:end + ago]
+                return
+
         # cache python dictionary lookups
         dst = self.array
         src = self.a.array
-        ago = self.ago
 
         for i in range(start, end):
             dst[i] = src[i + ago]
@@ -714,14 +1154,11 @@ class LinesOperation(LineActions):
     next/once is chosen using the operation direction (normal or reversed)
     and the nature of the operands (LineBuffer vs non-LineBuffer)
 
-    In the "once" operations "map" could be used as in:
-
-        operated = map(self.operation, srca[start:end], srcb[start:end])
-        self.array[start:end] = array.array(str(self.typecode), operated)
-
-    No real execution time benefits were appreciated and therefore the loops
-    have been kept in place for clarity (although the maps are not really
-    unclear here)
+    In the "once" operations the standard arithmetic and comparison
+    operators are applied over the entire range with a single call to the
+    corresponding numpy ufunc (if numpy is available). Any other operation
+    (or a range in which python would raise an exception, like a division by
+    zero) is executed with a loop, applying the operation to each element
     '''
 
     def __init__(self, a, b, operation, r=False):
@@ -761,7 +1198,23 @@ class LinesOperation(LineActions):
         else:
             self._once_val_op_r(start, end)
 
+    def _once_np(self, start, end, a, b):
+        # vectorized path: a and b are already sliced arrays or numbers
+        res = _npoperation(self.operation, a, b)
+        if res is None:
+            return False
+
+        self.ndarray()[start:end] = res
+        return True
+
     def _once_op(self, start, end):
+        if self.operation in _NPOPS:
+            srca, srcb = self.a.ndarray(), self.b.ndarray()
+            if srca is not None and srcb is not None:
+                if self._once_np(start, end,
+                                 srca[start:end], srcb[start:end]):
+                    return
+
         # cache python dictionary lookups
         dst = self.array
         srca = self.a.array
@@ -777,12 +1230,18 @@ class LinesOperation(LineActions):
         srca = self.a.array
         srcb = self.b
         op = self.operation
-        tz = self._tz
+        dts = num2date_array(srca[start:end], tz=self._tz)
 
-        for i in range(start, end):
-            dst[i] = op(num2date(srca[i], tz=tz).time(), srcb)
+        for i, dt in zip(range(start, end), dts):
+            dst[i] = op(dt.time(), srcb)
 
     def _once_val_op(self, start, end):
+        if self.operation in _NPOPS and isinstance(self.b, (int, float)):
+            srca = self.a.ndarray()
+            if srca is not None:
+                if self._once_np(start, end, srca[start:end], self.b):
+                    return
+
         # cache python dictionary lookups
         dst = self.array
         srca = self.a.array
@@ -793,6 +1252,12 @@ class LinesOperation(LineActions):
             dst[i] = op(srca[i], srcb)
 
     def _once_val_op_r(self, start, end):
+        if self.operation in _NPOPS and isinstance(self.a, (int, float)):
+            srcb = self.b.ndarray()
+            if srcb is not None:
+                if self._once_np(start, end, self.a, srcb[start:end]):
+                    return
+
         # cache python dictionary lookups
         dst = self.array
         srca = self.a
@@ -820,6 +1285,13 @@ class LineOwnOperation(LineActions):
         self[0] = self.operation(self.a[0])
 
     def once(self, start, end):
+        npop = _NPOPSOWN.get(self.operation)
+        if npop is not None:
+            dst, srca = self.ndarray(), self.a.ndarray()
+            if dst is not None and srca is not None:
+                dst[start:end] = npop(srca[start:end])
+                return
+
         # cache python dictionary lookups
         dst = self.array
         srca = self.a.array
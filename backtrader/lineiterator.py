@@ -29,7 +29,7 @@ from .utils.py3 import map, range, zip, with_metaclass, string_types
 from .utils import DotDict
 
 from .lineroot import LineRoot, LineSingle
-from .linebuffer import LineActions, LineNum
+from .linebuffer import LineActions, LineNum, oncecalls
 from .lineseries import LineSeries, LineSeriesMaker
 from .dataseries import DataSeries
 from . import metabase
@@ -43,6 +43,9 @@ class MetaLineIterator(LineSeries.__class__):
         # Prepare to hold children that need to be calculated and
         # influence minperiod - Moved here to support LineNum below
         _obj._lineiterators = collections.defaultdict(list)
+        # indicators of other owners reused from the object cache, which only
+        # influence the minperiod (see MetaIndicator)
+        _obj._sharedinds = list()
 
         # Scan args for datas ... if none are found,
         # use the _owner (to have a clock)
@@ -171,7 +174,7 @@ class LineIterator(with_metaclass(MetaLineIterator, LineSeries)):
         # lines (directly or indirectly after some operations)
         # An example is Kaufman's Adaptive Moving Average
         indicators = self._lineiterators[LineIterator.IndType]
-        indperiods = [ind._minperiod for ind in indicators]
+        indperiods = [ind._minperiod for ind in indicators + self._sharedinds]
         indminperiod = max(indperiods or [self._minperiod])
         self.updateminperiod(indminperiod)
 
@@ -291,18 +294,21 @@ class LineIterator(with_metaclass(MetaLineIterator, LineSeries)):
         return clock_len
 
     def _once(self):
-        self.forward(size=self._clock.buflen())
+        start = self.buflen()  # only values beyond it are calculated
+        self.forward(size=self._clock.buflen() - start)
 
         for indicator in self._lineiterators[LineIterator.IndType]:
             indicator._once()
 
         for observer in self._lineiterators[LineIterator.ObsType]:
-            observer.forward(size=self.buflen())
+            observer.forward(size=self.buflen() - observer.buflen())
 
         for data in self.datas:
             data.home()
 
-        for indicator in self._lineiterators[LineIterator.IndType]:
+        # shared indicators are moved along too by the calculations via next
+        for indicator in self._lineiterators[LineIterator.IndType] + \
+                self._sharedinds:
             indicator.home()
 
         for observer in self._lineiterators[LineIterator.ObsType]:
@@ -313,12 +319,11 @@ class LineIterator(with_metaclass(MetaLineIterator, LineSeries)):
         # These 3 remain empty for a strategy and therefore play no role
         # because a strategy will always be executed on a next basis
         # indicators are each called with its min period
-        self.preonce(0, self._minperiod - 1)
-        self.oncestart(self._minperiod - 1, self._minperiod)
-        self.once(self._minperiod, self.buflen())
+        oncecalls(self, start, self.buflen(),
+                  self._minperiod - self.lines[0].discarded)
 
         for line in self.lines:
-            line.oncebinding()
+            line.oncebinding(start)
 
     def preonce(self, start, end):
         pass
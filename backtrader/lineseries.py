@@ -196,14 +196,24 @@ class Lines(object):
     def itersize(self):
         return iter(self.lines[0:self.size()])
 
-    def __init__(self, initlines=None):
+    def __init__(self, initlines=None, dtypes=None):
         '''
         Create the lines recording during "_derive" or else use the
         provided "initlines"
+
+        "dtypes" maps line names to the dtype of their buffers
         '''
+        dtypes = dtypes or {}
         self.lines = list()
         for line, linealias in enumerate(self._getlines()):
+            if not isinstance(linealias, string_types):
+                # a tuple or list was passed, 1st is name
+                linealias = linealias[0]
+
             kwargs = dict()
+            if linealias in dtypes:
+                kwargs['dtype'] = dtypes[linealias]
+
             self.lines.append(LineBuffer(**kwargs))
 
         # Add the required extralines
@@ -342,6 +352,9 @@ class MetaLineSeries(LineMultiple.__class__):
         # remove the new plotinfo/plotlines definition if any
         newlalias = dict(dct.pop('linealias', {}))
 
+        # remove the new dtypes of the lines if any
+        newldtypes = dict(dct.pop('linedtypes', {}))
+
         # remove the new plotinfo/plotlines definition if any
         newplotinfo = dict(dct.pop('plotinfo', {}))
         newplotlines = dict(dct.pop('plotlines', {}))
@@ -354,6 +367,12 @@ class MetaLineSeries(LineMultiple.__class__):
         oblalias = [x.linealias for x in bases[1:] if hasattr(x, 'linealias')]
         cls.linealias = la = lalias._derive('la_' + name, newlalias, oblalias)
 
+        # dtypes of the lines (by name), added to those of the bases
+        ldtypes = getattr(cls, 'linedtypes', AutoInfoClass)
+        obldtypes = [x.linedtypes for x in bases[1:]
+                     if hasattr(x, 'linedtypes')]
+        cls.linedtypes = ldtypes._derive('ld_' + name, newldtypes, obldtypes)
+
         # Get the actual lines or a default
         lines = getattr(cls, 'lines', Lines)
 
@@ -415,6 +434,15 @@ class MetaLineSeries(LineMultiple.__class__):
         for pname, pdef in cls.plotinfo._getitems():
             setattr(plotinfo, pname, kwargs.pop(pname, pdef))
 
+        # dtypes of the lines, those of the class updated with the argument
+        linedtypes = dict(cls.linedtypes._getkwargsdefault())
+        ldtypes = kwargs.pop('linedtypes', None) or {}
+        for lname in ldtypes:
+            if lname not in cls.lines.getlinealiases():
+                raise ValueError('%s has no line %s' % (cls.__name__, lname))
+
+        linedtypes.update(ldtypes)
+
         # Create the object and set the params in place
         _obj, args, kwargs = super(MetaLineSeries, cls).donew(*args, **kwargs)
 
@@ -422,7 +450,7 @@ class MetaLineSeries(LineMultiple.__class__):
         _obj.plotinfo = plotinfo
 
         # _obj.lines shadows the lines (class) definition in the class
-        _obj.lines = cls.lines()
+        _obj.lines = cls.lines(dtypes=linedtypes)
 
         # _obj.plotinfo shadows the plotinfo (class) definition in the class
         _obj.plotlines = cls.plotlines()
@@ -454,6 +482,9 @@ class LineSeries(with_metaclass(MetaLineSeries, LineMultiple)):
     def array(self):
         return self.lines[0].array
 
+    def ndarray(self):
+        return self.lines[0].ndarray()
+
     def __getattr__(self, name):
         # to refer to line by name directly if the attribute was not found
         # in this object if we set an attribute in this object it will be
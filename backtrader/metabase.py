@@ -24,6 +24,7 @@ from __future__ import (absolute_import, division, print_function,
 from collections import OrderedDict
 import itertools
 import sys
+import threading
 
 import backtrader as bt
 from .utils.py3 import zip, string_types, with_metaclass
@@ -39,7 +40,23 @@ def findbases(kls, topclass):
     return retval
 
 
+class _Owners(threading.local):
+    def __init__(self):
+        self.stack = list()  # objects being created, innermost last
+
+
+_owners = _Owners()
+
+
 def findowner(owned, cls, startlevel=2, skip=None):
+    # objects in the middle of their creation (see MetaBase.__call__) own
+    # what they create
+    for obj in reversed(_owners.stack):
+        if obj is not owned and obj is not skip and isinstance(obj, cls):
+            return obj
+
+    # look for the owner in the callers (objects created from the methods of
+    # an already created object, like the strategies in cerebro)
     # skip this frame and the caller's -> start at 2
     for framelevel in itertools.count(startlevel):
         try:
@@ -69,6 +86,7 @@ class MetaBase(type):
 
     def donew(cls, *args, **kwargs):
         _obj = cls.__new__(cls, *args, **kwargs)
+        _owners.stack.append(_obj)  # owner of what is created from now on
         return _obj, args, kwargs
 
     def dopreinit(cls, _obj, *args, **kwargs):
@@ -83,10 +101,16 @@ class MetaBase(type):
 
     def __call__(cls, *args, **kwargs):
         cls, args, kwargs = cls.doprenew(*args, **kwargs)
-        _obj, args, kwargs = cls.donew(*args, **kwargs)
-        _obj, args, kwargs = cls.dopreinit(_obj, *args, **kwargs)
-        _obj, args, kwargs = cls.doinit(_obj, *args, **kwargs)
-        _obj, args, kwargs = cls.dopostinit(_obj, *args, **kwargs)
+        stack = _owners.stack
+        depth = len(stack)
+        try:
+            _obj, args, kwargs = cls.donew(*args, **kwargs)
+            _obj, args, kwargs = cls.dopreinit(_obj, *args, **kwargs)
+            _obj, args, kwargs = cls.doinit(_obj, *args, **kwargs)
+            _obj, args, kwargs = cls.dopostinit(_obj, *args, **kwargs)
+        finally:
+            del stack[depth:]  # the object is done (or failed)
+
         return _obj
 
 
@@ -0,0 +1,296 @@
+#!/usr/bin/env python
+# -*- coding: utf-8; py-indent-offset:4 -*-
+###############################################################################
+#
+# Copyright (C) 2015-2023 Daniel Rodriguez
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+###############################################################################
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+import glob
+import numbers
+import os
+import sqlite3
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None  # only needed for ParquetOptStore
+
+import backtrader as bt
+from .errors import ModuleImportError
+from .utils.py3 import with_metaclass, string_types
+
+
+__all__ = ['OptStore', 'SQLiteOptStore', 'ParquetOptStore']
+
+
+def _optkey(strats):
+    # identifies a combination of strategies and params across runs
+    return repr(tuple((stratcls.__name__, tuple(params._getkwargs().items()))
+                      for stratcls, params in strats))
+
+
+def _isscalar(value):
+    return value is None or isinstance(value, (bool, numbers.Real,
+                                               string_types))
+
+
+def _scalar(value):
+    # numbers are stored as the python types (for example, not numpy ones)
+    if isinstance(value, bool) or not isinstance(value, numbers.Real):
+        return value if _isscalar(value) else repr(value)
+
+    if isinstance(value, numbers.Integral):
+        return int(value)
+
+    return float(value)
+
+
+def _flatten(row, prefix, value):
+    if isinstance(value, dict):
+        for k, v in value.items():
+            if isinstance(k, string_types):  # skip keys like datetimes
+                _flatten(row, prefix + '.' + k, v)
+
+    elif _isscalar(value):
+        row[prefix] = _scalar(value)
+
+
+class OptStore(with_metaclass(bt.MetaParams, object)):
+    '''Base class for the stores of optimization results (see the ``optstore``
+    parameter of ``Cerebro``)
+
+    The results are handed to the store as each run finishes and are then
+    released. Each strategy of each run becomes a row with the columns:
+
+      - ``optkey``: identifies the combination of strategies and params of
+        the run. Runs already in the store are skipped when the optimization
+        is run again (resumed)
+
+      - ``strategy``: name of the strategy class
+
+      - one per parameter of the strategy, with the name of the parameter.
+        Values which are not numbers, strings or ``None`` are stored with
+        their ``repr``
+
+      - one per value in the analysis of each analyzer, named after the
+        analyzer and the keys leading to the value, joined with ``.`` (for
+        example: ``returns.rtot``). Only string keys and values which are
+        numbers, strings or ``None`` are considered
+
+    Params:
+
+      - ``batch`` (default: ``64``): rows kept in memory before writing them
+        out. They are also written out if the optimization fails with an
+        exception, but are lost if the process is killed, and their runs will
+        then be repeated when resuming
+
+    Subclasses implement ``_open``, ``_keys``, ``_write`` and ``_close``
+    '''
+    params = (
+        ('batch', 64),
+    )
+
+    def __getstate__(self):
+        # Only used by the process running the optimization. Do not send the
+        # store (open files, connections) to the optimization workers
+        return dict(params=self.params, p=self.p)
+
+    def start(self):
+        self._rows = list()
+        self._open()
+        self._done = set(self._keys())
+
+    def stop(self):
+        self.flush()
+        self._close()
+
+    def isdone(self, iterstrat):
+        '''Returns ``True`` if the results of the given combination of
+        strategies and arguments (as delivered by ``optstrategy``) are already
+        in the store'''
+        strats = []
+        for stratcls, args, kwargs in iterstrat:
+            params = stratcls.params()
+            for k, v in kwargs.items():
+                if hasattr(params, k):
+                    setattr(params, k, v)
+
+            strats.append((stratcls, params))
+
+        return _optkey(strats) in self._done
+
+    def add(self, runstrat):
+        '''Adds the results of a run: a list of strategies or ``OptReturn``
+        instances'''
+        strats = [(getattr(strat, 'strategycls', type(strat)), strat.params)
+                  for strat in runstrat]
+        optkey = _optkey(strats)
+
+        for (stratcls, params), strat in zip(strats, runstrat):
+            row = dict(optkey=optkey, strategy=stratcls.__name__)
+            for k, v in params._getkwargs().items():
+                row[k] = _scalar(v)
+
+            for name, analyzer in strat.analyzers.getitems():
+                _flatten(row, name, analyzer.get_analysis())
+
+            self._rows.append(row)
+
+        self._done.add(optkey)
+        if len(self._rows) >= self.p.batch:
+            self.flush()
+
+    def flush(self):
+        '''Writes out the rows kept in memory'''
+        if self._rows:
+            self._write(self._rows)
+            self._rows = list()
+
+    def read(self):
+        '''Returns the stored results as a ``pandas.DataFrame``'''
+        raise NotImplementedError
+
+    def _open(self):
+        pass
+
+    def _keys(self):
+        return []
+
+    def _write(self, rows):
+        raise NotImplementedError
+
+    def _close(self):
+        pass
+
+
+class SQLiteOptStore(OptStore):
+    '''Stores the optimization results in a table of an SQLite database
+
+    Columns are added to the table as new ones show up in the results
+
+    Params:
+
+      - ``dbname`` (default: ``'optresults.db'``): file of the database
+
+      - ``table`` (default: ``'optresults'``): name of the table
+    '''
+    params = (
+        ('dbname', 'optresults.db'),
+        ('table', 'optresults'),
+    )
+
+    def _open(self):
+        self._conn = sqlite3.connect(self.p.dbname)
+        self._conn.execute('CREATE TABLE IF NOT EXISTS "%s" (optkey TEXT)' %
+                           self.p.table)
+        self._columns = self._getcolumns()
+
+    def _getcolumns(self):
+        cursor = self._conn.execute('PRAGMA table_info("%s")' % self.p.table)
+        return [x[1] for x in cursor]
+
+    def _keys(self):
+        cursor = self._conn.execute('SELECT DISTINCT optkey FROM "%s"' %
+                                    self.p.table)
+        return [x[0] for x in cursor]
+
+    def _write(self, rows):
+        for row in rows:
+            for column in row:
+                # sqlite column names are case insensitive
+                if column.lower() not in (x.lower() for x in self._columns):
+                    self._conn.execute('ALTER TABLE "%s" ADD COLUMN "%s"' %
+                                       (self.p.table, column))
+                    self._columns.append(column)
+
+        columns = self._columns
+        self._conn.executemany(
+            'INSERT INTO "%s" (%s) VALUES (%s)' % (
+                self.p.table,
+                ', '.join('"%s"' % x for x in columns),
+                ', '.join('?' * len(columns))),
+            [[row.get(x) for x in columns] for row in rows])
+        self._conn.commit()
+
+    def _close(self):
+        self._conn.close()
+
+    def read(self):
+        import pandas as pd
+        conn = sqlite3.connect(self.p.dbname)
+        try:
+            return pd.read_sql_query('SELECT * FROM "%s"' % self.p.table,
+                                     conn)
+        finally:
+            conn.close()
+
+
+class ParquetOptStore(OptStore):
+    '''Stores the optimization results as a Parquet dataset: a directory in
+    which each batch of rows is written to a new file
+
+    Needs ``pyarrow``
+
+    Params:
+
+      - ``path`` (default: ``'optresults'``): directory of the dataset
+    '''
+    params = (
+        ('path', 'optresults'),
+    )
+
+    def _files(self):
+        return sorted(glob.glob(os.path.join(self.p.path, 'part-*.parquet')))
+
+    def _open(self):
+        if pa is None:
+            raise ModuleImportError('pyarrow is needed for ParquetOptStore')
+
+        if not os.path.isdir(self.p.path):
+            os.makedirs(self.p.path)
+
+        self._nfile = len(self._files())
+
+    def _keys(self):
+        keys = []
+        for fname in self._files():
+            table = pq.read_table(fname, columns=['optkey'])
+            keys.extend(table.column('optkey').to_pylist())
+
+        return keys
+
+    def _write(self, rows):
+        fname = os.path.join(self.p.path, 'part-%05d.parquet' % self._nfile)
+        pq.write_table(pa.Table.from_pylist(rows), fname + '.tmp')
+        os.replace(fname + '.tmp', fname)  # no partial files on failure
+        self._nfile += 1
+
+    def read(self):
+        if pa is None:
+            raise ModuleImportError('pyarrow is needed for ParquetOptStore')
+
+        tables = [pq.read_table(fname) for fname in self._files()]
+        if not tables:
+            import pandas as pd
+            return pd.DataFrame()
+
+        # the columns may differ from batch to batch
+        table = pa.concat_tables(tables, promote_options='permissive')
+        return table.to_pandas()
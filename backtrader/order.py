@@ -21,7 +21,6 @@
 from __future__ import (absolute_import, division, print_function,
                         unicode_literals)
 
-import collections
 from copy import copy
 import datetime
 import itertools
@@ -58,6 +57,12 @@ class OrderExecutionBit(object):
       - pprice: current open position price
 
     '''
+    # Execution bits are created for each (partial) execution and are kept
+    # for the life of the order: slots save the per-instance dict
+    __slots__ = ('dt', 'size', 'price',
+                 'closed', 'opened', 'closedvalue', 'openedvalue',
+                 'closedcomm', 'openedcomm',
+                 'value', 'comm', 'pnl', 'psize', 'pprice')
 
     def __init__(self,
                  dt=None, size=0, price=0.0,
@@ -114,8 +119,9 @@ class OrderData(object):
       - pprice: current open position price
 
     '''
-    # According to the docs, collections.deque is thread-safe with appends at
-    # both ends, there will be no pop (nowhere) and therefore to know which the
+    # Appends to a list are atomic (as they are with collections.deque, which
+    # costs far more memory for the few exbits of an order) and there will be
+    # no pop (nowhere) and therefore to know which the
     # new exbits are two indices are needed. At time of cloning (__copy__) the
     # indices can be updated to match the previous end, and the new end
     # (len(exbits)
@@ -127,11 +133,18 @@ class OrderData(object):
     # the len of the exbits can be queried with no concerns about another
     # thread making an append and with no need for a lock
 
+    # Two instances per order (created, executed) plus one per notification
+    # (clone): slots save the per-instance dict
+    __slots__ = ('pclose', 'exbits', 'p1', 'p2',
+                 'dt', 'size', 'remsize', 'price', 'pricelimit',
+                 'trailamount', 'trailpercent', '_plimit',
+                 'value', 'comm', 'margin', 'pnl', 'psize', 'pprice')
+
     def __init__(self, dt=None, size=0, price=0.0, pricelimit=0.0, remsize=0,
                  pclose=0.0, trailamount=0.0, trailpercent=0.0):
 
         self.pclose = pclose
-        self.exbits = collections.deque()  # for historical purposes
+        self.exbits = list()  # for historical purposes
         self.p1, self.p2 = 0, 0  # indices to pending notifications
 
         self.dt = dt
@@ -213,6 +226,12 @@ class OrderData(object):
         # rebuild the indices to mark which exbits are pending in clone
         self.p1, self.p2 = self.p2, len(self.exbits)
 
+    def __copy__(self):
+        obj = self.__class__.__new__(self.__class__)
+        for name in self.__slots__:
+            setattr(obj, name, getattr(self, name))
+        return obj
+
     def clone(self):
         self.markpending()
         obj = copy(self)
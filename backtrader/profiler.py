@@ -0,0 +1,190 @@
+#!/usr/bin/env python
+# -*- coding: utf-8; py-indent-offset:4 -*-
+###############################################################################
+#
+# Copyright (C) 2015-2023 Daniel Rodriguez
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+###############################################################################
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+import time
+
+from .lineiterator import LineIterator
+from .utils import OrderedDict
+from .utils.py3 import range, zip
+
+try:
+    _timer = time.perf_counter
+except AttributeError:  # python 2
+    _timer = time.time
+
+
+__all__ = ['Profile']
+
+
+class Profile(list):
+    '''Table with the wall time spent by the components of a run (see the
+    ``profile`` parameter of ``Cerebro``), with a row (``OrderedDict``) per
+    component and method with the keys:
+
+      - ``kind``: ``data``, ``broker``, ``strategy``, ``indicator``,
+        ``observer`` or ``analyzer``
+
+      - ``name``: label of the component. Strategies are labeled with their
+        index in the run (``MyStrategy #0``)
+
+      - ``owner``: label of the component owning it (empty if none)
+
+      - ``method``: the profiled method
+
+      - ``calls``: number of calls
+
+      - ``time``: seconds spent in the calls, including the time spent in
+        other profiled components called from them (for example, the
+        indicators used by an indicator)
+
+      - ``own``: seconds spent in the calls excluding the time spent in other
+        profiled components
+
+    The rows are sorted by ``own`` in descending order. Printing the table
+    gives a text rendering of it
+    '''
+    columns = ('kind', 'name', 'owner', 'method', 'calls', 'time', 'own')
+
+    def __str__(self):
+        lines = [self.columns]
+        for row in self:
+            lines.append((row['kind'], row['name'], row['owner'],
+                          row['method'], str(row['calls']),
+                          '%.6f' % row['time'], '%.6f' % row['own']))
+
+        widths = [max(len(line[i]) for line in lines)
+                  for i in range(len(self.columns))]
+        return '\n'.join(
+            '  '.join(x.ljust(w) for x, w in zip(line, widths)).rstrip()
+            for line in lines)
+
+
+_missing = object()
+
+
+def _label(obj):
+    try:
+        return obj.plotlabel()
+    except AttributeError:  # line operations have no plotting info
+        return obj.__class__.__name__
+
+
+class Profiler(object):
+    '''Replaces methods of the components of a run with timed versions and
+    puts the originals back when done'''
+
+    nexts = ('nextstart', 'prenext', 'next')
+
+    def __init__(self):
+        self._entries = list()
+        self._wrapped = set()  # (id(obj), attr) of the entries
+        self._stack = list()  # time spent in profiled calls of active calls
+        self._strategies = 0
+
+    def wrap(self, obj, attr, kind, name, owner=''):
+        # an object can be reached more than once (indicators shared across
+        # owners with objcache): it is only timed and restored once
+        key = (id(obj), attr)
+        if key in self._wrapped:
+            return
+
+        method = getattr(obj, attr, None)
+        if method is None:
+            return
+
+        counters = [0, 0.0, 0.0]  # calls, time, own
+        stack = self._stack
+
+        def timed(*args, **kwargs):
+            stack.append(0.0)
+            t0 = _timer()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                elapsed = _timer() - t0
+                counters[0] += 1
+                counters[1] += elapsed
+                counters[2] += elapsed - stack.pop()
+                if stack:
+                    stack[-1] += elapsed
+
+        row = OrderedDict(kind=kind, name=name, owner=owner, method=attr)
+        self._entries.append((row, counters, obj, attr,
+                              obj.__dict__.get(attr, _missing)))
+        self._wrapped.add(key)
+        setattr(obj, attr, timed)
+
+    def adddata(self, data):
+        name = data._name or data.__class__.__name__
+        for attr in ('preload', 'load'):
+            self.wrap(data, attr, 'data', name)
+
+    def addbroker(self, broker):
+        self.wrap(broker, 'next', 'broker', broker.__class__.__name__)
+
+    def addstrategy(self, strategy):
+        # the index tells apart strategies of the same class
+        label = '%s #%d' % (_label(strategy), self._strategies)
+        self._strategies += 1
+        for attr in self.nexts:
+            self.wrap(strategy, attr, 'strategy', label)
+
+        self._addindicators(strategy, label)
+
+        for observer in strategy._lineiterators[LineIterator.ObsType]:
+            obslabel = _label(observer)
+            for attr in self.nexts:
+                self.wrap(observer, attr, 'observer', obslabel, label)
+
+            self._addindicators(observer, obslabel)
+
+        for name, analyzer in strategy.analyzers.getitems():
+            for attr in self.nexts:
+                self.wrap(analyzer, attr, 'analyzer', name, label)
+
+    def _addindicators(self, owner, label):
+        for ind in owner._lineiterators[LineIterator.IndType]:
+            indlabel = _label(ind)
+            for attr in ('_next', '_once'):
+                self.wrap(ind, attr, 'indicator', indlabel, label)
+
+            if hasattr(ind, '_lineiterators'):
+                self._addindicators(ind, indlabel)
+
+    def stop(self):
+        '''Puts the original methods back and returns the ``Profile``'''
+        profile = Profile()
+        for row, counters, obj, attr, saved in reversed(self._entries):
+            if saved is _missing:
+                delattr(obj, attr)
+            else:
+                setattr(obj, attr, saved)
+
+            if counters[0]:
+                row['calls'], row['time'], row['own'] = counters
+                profile.append(row)
+
+        self._entries = list()
+        self._wrapped = set()
+        profile.sort(key=lambda x: x['own'], reverse=True)
+        return profile
@@ -156,7 +156,8 @@ class Strategy(with_metaclass(MetaStrategy, StrategyBase)):
         dataids = [id(data) for data in self.datas]
 
         _dminperiods = collections.defaultdict(list)
-        for lineiter in self._lineiterators[LineIterator.IndType]:
+        indicators = self._lineiterators[LineIterator.IndType]
+        for lineiter in indicators + self._sharedinds:
             # if multiple datas are used and multiple timeframes the larger
             # timeframe may place larger time constraints in calling next.
             clk = getattr(lineiter, '_clock', None)
@@ -210,8 +211,7 @@ class Strategy(with_metaclass(MetaStrategy, StrategyBase)):
             self._minperiods.append(dminperiod)
 
         # Set the minperiod
-        minperiods = \
-            [x._minperiod for x in self._lineiterators[LineIterator.IndType]]
+        minperiods = [x._minperiod for x in indicators + self._sharedinds]
         self._minperiod = max(minperiods or [self._minperiod])
 
     def _addwriter(self, writer):
@@ -290,7 +290,10 @@ class Strategy(with_metaclass(MetaStrategy, StrategyBase)):
             self.prenext_open()
 
     def _oncepost(self, dt):
-        for indicator in self._lineiterators[LineIterator.IndType]:
+        # shared indicators may belong to an indicator, which in runonce
+        # does not move them with each bar
+        indicators = self._lineiterators[LineIterator.IndType]
+        for indicator in indicators + self._sharedinds:
             if len(indicator._clock) > len(indicator):
                 indicator.advance()
 
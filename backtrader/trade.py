@@ -59,17 +59,15 @@ class TradeHistory(AutoOrderedDict):
                  status, dt, barlen, size, price, value, pnl, pnlcomm, tz, event=None):
         '''Initializes the object to the current status of the Trade'''
         super(TradeHistory, self).__init__()
-        self.status.status = status
-        self.status.dt = dt
-        self.status.barlen = barlen
-        self.status.size = size
-        self.status.price = price
-        self.status.value = value
-        self.status.pnl = pnl
-        self.status.pnlcomm = pnlcomm
-        self.status.tz = tz
+        # built in one go rather than through the '.' notation, which looks up
+        # (and autocreates) "status" for each key
+        statusd = AutoOrderedDict()
+        statusd.update((('status', status), ('dt', dt), ('barlen', barlen),
+                        ('size', size), ('price', price), ('value', value),
+                        ('pnl', pnl), ('pnlcomm', pnlcomm), ('tz', tz)))
+        self['status'] = statusd
         if event is not None:
-            self.event = event
+            self['event'] = event
 
     def __reduce__(self):
         return (self.__class__, (self.status.status, self.status.dt, self.status.barlen, self.status.size,
@@ -144,6 +142,13 @@ class Trade(object):
         The last entry in the history is the Closing Event
 
     '''
+    __slots__ = ('ref', 'data', 'tradeid',
+                 'size', 'price', 'value', 'commission', 'pnl', 'pnlcomm',
+                 'justopened', 'isopen', 'isclosed', 'long',
+                 'baropen', 'dtopen', 'barclose', 'dtclose', 'barlen',
+                 'historyon', 'history',
+                 'status')
+
     refbasis = itertools.count(1)
 
     status_names = ['Created', 'Open', 'Closed']
@@ -25,6 +25,11 @@ import datetime
 import math
 import time as _time
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 from .py3 import string_types
 
 
@@ -191,6 +196,84 @@ def num2date(x, tz=None, naive=True):
     return dt
 
 
+def num2date_array(x, tz=None, naive=True):
+    '''
+    Converts a sequence (``ndarray``, ``array.array``, list ...) of float
+    coded datetimes to a list of ``datetime`` instances, the same which
+    ``num2date`` returns for each individual value, converting the values
+    at once with ``numpy`` (if available) when no ``tz`` is given
+    '''
+    if np is None or tz is not None:
+        return [num2date(v, tz=tz, naive=naive) for v in x]
+
+    x = np.asarray(x, dtype=np.float64)
+    if not len(x):
+        return []
+
+    # the same float operations num2date carries out for a single value
+    ix = np.trunc(x)
+    hour, remainder = np.divmod(HOURS_PER_DAY * (x - ix), 1.0)
+    minute, remainder = np.divmod(MINUTES_PER_HOUR * remainder, 1.0)
+    second, remainder = np.divmod(SECONDS_PER_MINUTE * remainder, 1.0)
+    microsecond = (MUSECONDS_PER_SECOND * remainder).astype(np.int64)
+    microsecond[microsecond < 10] = 0  # compensate for rounding errors
+
+    musecs = (((ix.astype(np.int64) - 719163) * 24 +  # 1970-01-01 ordinal
+               hour.astype(np.int64)) * 60 + minute.astype(np.int64)) * 60
+    musecs = (musecs + second.astype(np.int64)) * 10 ** 6 + microsecond
+
+    # compensate for rounding errors
+    roundup = microsecond > 999990
+    musecs[roundup] += 10 ** 6 - microsecond[roundup]
+
+    return musecs.astype('datetime64[us]').tolist()
+
+
+def date2num_array(values):
+    '''
+    Converts the ``numpy`` ``datetime64`` values (or pandas datetime index or
+    column, also timezone aware) to an ``ndarray`` of float coded datetimes,
+    the same which ``date2num`` returns for each individual datetime
+
+    Returns ``None`` if ``numpy`` is not available or the values cannot be
+    converted as a block (not datetimes or NaT values)
+    '''
+    if np is None or getattr(values.dtype, 'kind', None) != 'M':
+        return None
+
+    if getattr(values.dtype, 'tz', None) is not None:
+        # to UTC as date2num does with the utcoffset of aware datetimes
+        if hasattr(values, 'dt'):
+            values = values.dt.tz_convert(None)
+        else:
+            values = values.tz_convert(None)
+
+    values = np.asarray(values, dtype='datetime64[us]')
+    if np.isnat(values).any():
+        return None
+
+    musecs = values.astype(np.int64)
+    days, musecs = np.divmod(musecs, 86400 * 10 ** 6)
+    ordinals = (days + 719163).astype(np.float64)  # 1970-01-01 ordinal
+
+    # midnight values are the ordinal, else mimic date2num with math.fsum
+    intraday = np.flatnonzero(musecs)
+    if len(intraday):
+        musecs = musecs[intraday]
+        hours, musecs = np.divmod(musecs, 3600 * 10 ** 6)
+        minutes, musecs = np.divmod(musecs, 60 * 10 ** 6)
+        seconds, musecs = np.divmod(musecs, 10 ** 6)
+        ordinals[intraday] = [
+            math.fsum(x) for x in zip(ordinals[intraday].tolist(),
+                                      (hours / HOURS_PER_DAY).tolist(),
+                                      (minutes / MINUTES_PER_DAY).tolist(),
+                                      (seconds / SECONDS_PER_DAY).tolist(),
+                                      (musecs / MUSECONDS_PER_DAY).tolist())
+        ]
+
+    return ordinals
+
+
 def num2dt(num, tz=None, naive=True):
     return num2date(num, tz=tz, naive=naive).date()
 
@@ -0,0 +1,10 @@
+"""
+Benchmarks of the backtrader engine running the strategies of ``trading``.
+
+Run them from the root of the repository with::
+
+    python -m benchmarks
+
+Each case is run in a process of its own (see ``benchmarks.cases``) and the
+results are appended to a JSON history (see ``benchmarks.__main__``).
+"""
@@ -0,0 +1,212 @@
+"""
+Runs the benchmarks and appends the results to a JSON history, to compare
+them across commits::
+
+    python -m benchmarks [-k PATTERN] [--repeat N] [--maxcpus N]
+                         [--history FILE] [--against COMMIT] [--list]
+
+The history (default: ``benchmarks/history.json``) is a list with an entry per
+invocation, holding the commit (and whether the tree had changes), the
+platform and the results of each case. The results are printed along with the
+change of the bars per second against the latest result of each case in the
+history (or in the entries of the given commit). The exit code is 1 if a case
+failed (its error is also printed on stderr), after saving the history.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+
+from benchmarks.cases import ROOT, MODEL_DIR, build_cases
+
+HISTORY = os.path.join(ROOT, "benchmarks", "history.json")
+
+
+def git_info() -> dict:
+    """
+    Returns the current commit and whether tracked files have changes.
+    """
+    def git(*args):
+        return subprocess.run(("git",) + args, cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+
+    try:
+        commit = git("rev-parse", "HEAD")
+        dirty = bool(git("status", "--porcelain", "--untracked-files=no"))
+    except (OSError, subprocess.CalledProcessError):
+        return dict(commit=None, dirty=None)
+
+    return dict(commit=commit, dirty=dirty)
+
+
+def make_workdir() -> str:
+    """
+    Returns a temporary working directory for the cases, with the ``model``
+    directory of the repository and a ``log`` directory, so that the
+    strategies do not log into the repository.
+    """
+    workdir = tempfile.mkdtemp(prefix="benchmarks-")
+    os.mkdir(os.path.join(workdir, "log"))
+    try:
+        os.symlink(MODEL_DIR, os.path.join(workdir, "model"))
+    except OSError:  # no symlinks (Windows)
+        shutil.copytree(MODEL_DIR, os.path.join(workdir, "model"))
+
+    return workdir
+
+
+def run_case(case: dict, workdir: str) -> dict:
+    """
+    Runs a case in a new process and returns its measurements, or the error
+    which made it fail.
+    """
+    fd, output = tempfile.mkstemp(suffix=".json", dir=workdir)
+    os.close(fd)
+
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        [ROOT] + [x for x in [env.get("PYTHONPATH")] if x])
+    try:
+        proc = subprocess.run(
+            [sys.executable, "-m", "benchmarks.worker", json.dumps(case),
+             output],
+            cwd=workdir, env=env, stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE, text=True)
+        if proc.returncode:
+            lines = proc.stderr.strip().splitlines()
+            return dict(error=lines[-1] if lines else
+                        f"exit code {proc.returncode}")
+
+        with open(output) as f:
+            return json.load(f)
+    finally:
+        os.remove(output)
+
+
+def load_history(path: str) -> list:
+    if not os.path.exists(path):
+        return []
+
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_history(path: str, history: list) -> None:
+    with open(path + ".tmp", "w") as f:
+        json.dump(history, f, indent=1)
+    os.replace(path + ".tmp", path)  # no partial history on failure
+
+
+def baseline(history: list, commit: str = None) -> dict:
+    """
+    Returns the latest result of each case (by name) in the history, or in
+    the entries of ``commit`` (prefix of the hash).
+    """
+    results = {}
+    for entry in history:
+        if commit is None or (entry["commit"] or "").startswith(commit):
+            results.update((x["name"], x) for x in entry["results"])
+
+    return results
+
+
+def report(results: list, previous: dict) -> None:
+    print(f"{'case':<48} {'bars/s':>10} {'change':>8} {'1st bar':>8} "
+          f"{'rss MB':>8}")
+    for result in results:
+        name = result["name"]
+        if "bars_per_sec" not in result:
+            print(f"{name:<48} {result.get('skip') or result['error']}")
+            continue
+
+        change = ""
+        before = previous.get(name, {}).get("bars_per_sec")
+        if before:
+            change = f"{100.0 * (result['bars_per_sec'] / before - 1):+.1f}%"
+
+        first = result["first_bar"]
+        rss = result["peak_rss_mb"]
+        print(f"{name:<48} {result['bars_per_sec']:>10.0f} {change:>8} "
+              f"{'' if first is None else f'{first:.3f}':>8} "
+              f"{'' if rss is None else f'{rss:.0f}':>8}")
+
+
+def main(argv: list = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks",
+        description="Benchmarks of the backtrader engine")
+    parser.add_argument("-k", dest="pattern", default="",
+                        help="run only the cases with this text in the name")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="runs of each case, the fastest one is kept")
+    parser.add_argument("--maxcpus", type=int, default=None,
+                        help="highest number of processes to optimize with "
+                             "(default: all CPUs)")
+    parser.add_argument("--history", default=HISTORY,
+                        help="JSON file with the history of the results")
+    parser.add_argument("--against", default=None,
+                        help="commit to compare with (default: the previous "
+                             "entry of the history)")
+    parser.add_argument("--list", action="store_true",
+                        help="list the cases and exit")
+    args = parser.parse_args(argv)
+
+    cases = [x for x in build_cases(args.maxcpus)
+             if args.pattern in x["name"]]
+    if args.list:
+        for case in cases:
+            skip = f" ({case['skip']})" if case["skip"] else ""
+            print(case["name"] + skip)
+        return 0
+
+    workdir = make_workdir()
+    results = []
+    try:
+        for case in cases:
+            print(f"running {case['name']}", file=sys.stderr, flush=True)
+            result = dict(name=case["name"], strategy=case["strategy"],
+                          tickers=len(case["tickers"]),
+                          cerebro=case["cerebro"])
+            if case["skip"]:
+                result.update(skip=case["skip"])
+            else:
+                runs = [run_case(case, workdir) for _ in range(args.repeat)]
+                runs = [x for x in runs if "error" not in x] or runs
+                result.update(max(runs, key=lambda x: x.get("bars_per_sec",
+                                                            0)))
+
+            results.append(result)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    history = load_history(args.history)
+    previous = baseline(history, args.against)
+
+    entry = git_info()
+    entry.update(
+        date=datetime.datetime.now().isoformat(timespec="seconds"),
+        python=platform.python_version(),
+        platform=platform.platform(),
+        cpus=os.cpu_count(),
+        repeat=args.repeat,
+        results=results,
+    )
+    history.append(entry)
+    save_history(args.history, history)
+
+    report(results, previous)
+
+    failed = [x for x in results if "error" in x]
+    for result in failed:
+        print(f"FAILED {result['name']}: {result['error']}", file=sys.stderr)
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,250 @@
+"""
+Benchmark cases and the code running a single case.
+
+A case is a (JSON serializable) dict with:
+
+- name: unique name of the case, starting with its group
+- group: ``modes``, ``strategies``, ``tickers`` or ``optimize``
+- strategy: name of a strategy of ``trading.traditional_strategies`` or
+  ``trading.ai_strategies``
+- params: params of the strategy (values to sweep for ``optimize``)
+- tickers: tickers of the data feeds
+- datafile: ``all`` (``data/us_stock/all_<ticker>.csv``) or ``predictions``
+  (``data/us_stock/predictions/<ticker>.csv``)
+- cerebro: params for ``bt.Cerebro`` (``runonce``, ``preload``,
+  ``exactbars``, ``chunkbars``, ``maxcpus``)
+- skip: reason to skip the case (missing dependencies) or ``None``
+
+The broker is set up like ``AITrader`` does.
+"""
+import glob
+import importlib
+import importlib.util
+import multiprocessing
+import os
+import sys
+import time
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+import backtrader as bt
+import pandas as pd
+
+from trading.utils import PandasData_Customized
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(ROOT, "data", "us_stock")
+MODEL_DIR = os.path.join(ROOT, "model")
+
+# broker and sizer settings of AITrader
+CASH = 1000000
+COMMISSION = 0.001425
+PERCENTS = 95
+
+MODES_STRATEGY = "CrossMovingAverage"  # strategy for the engine modes
+OPT_STRATEGY = "NaiveMovingAverage"
+OPT_PARAMS = dict(sma_period=list(range(10, 50, 5)))
+
+
+class BarClock(bt.Analyzer):
+    """
+    Records the time at which the strategy gets its first bar and the number
+    of bars of its datas.
+    """
+
+    def start(self):
+        self.rets.first = None
+
+    def next(self):
+        if self.rets.first is None:
+            self.rets.first = time.time()
+
+    def stop(self):
+        self.rets.bars = sum(len(data) for data in self.strategy.datas)
+
+
+def all_tickers() -> list:
+    """
+    Returns the tickers with a ``data/us_stock/all_<ticker>.csv`` file.
+    """
+    files = glob.glob(os.path.join(DATA_DIR, "all_*.csv"))
+    return sorted(os.path.basename(x)[len("all_"):-len(".csv")] for x in files)
+
+
+def traditional_strategies() -> list:
+    """
+    Returns the names of the strategies of ``trading.traditional_strategies``
+    in the order in which they are defined.
+    """
+    from trading.base_strategy import BaseStrategy
+    module = importlib.import_module("trading.traditional_strategies")
+    return [name for name, obj in vars(module).items()
+            if isinstance(obj, type) and issubclass(obj, BaseStrategy)
+            and obj.__module__ == module.__name__]
+
+
+def _missing(*modules) -> str:
+    missing = [x for x in modules if importlib.util.find_spec(x) is None]
+    return "missing " + ", ".join(missing) if missing else None
+
+
+def build_cases(maxcpus: int = None) -> list:
+    """
+    Returns all the benchmark cases. ``optimize`` cases are built for 1 to
+    ``maxcpus`` (default: all) CPUs.
+    """
+    cases = []
+
+    def add(group, name, strategy, params=None, tickers=("AAPL",),
+            datafile="all", skip=None, **cerebro):
+        cases.append(dict(name=f"{group}/{name}", group=group,
+                          strategy=strategy, params=params or {},
+                          tickers=list(tickers), datafile=datafile,
+                          cerebro=cerebro, skip=skip))
+
+    # execution modes of the engine
+    for runonce in (True, False):
+        for preload in (True, False):
+            for exactbars in (-1, 0, 1):
+                add("modes",
+                    f"runonce={int(runonce)},preload={int(preload)},"
+                    f"exactbars={exactbars}",
+                    MODES_STRATEGY, runonce=runonce, preload=preload,
+                    exactbars=exactbars)
+
+    # runonce with bounded memory
+    add("modes", "runonce=1,preload=1,chunkbars=500", MODES_STRATEGY,
+        chunkbars=500)
+
+    # every strategy in the default mode
+    for strategy in traditional_strategies():
+        add("strategies", strategy, strategy)
+
+    for model_name in ("Logistic_Regression", "Gradient_Boosting"):
+        add("strategies", f"MLTradingStrategy/{model_name}",
+            "MLTradingStrategy",
+            params=dict(model_name=model_name, stock_ticker="AAPL"),
+            skip=_missing("joblib", "sklearn"))
+
+    add("strategies", "RNNStrategy", "RNNStrategy", datafile="predictions")
+    add("strategies", "DQNStrategy", "DQNStrategy",
+        skip=_missing("torch", "gym"))
+
+    # a single ticker vs all of them
+    tickers = all_tickers()
+    for runonce in (True, False):
+        for group in (tickers[:1], tickers):
+            add("tickers", f"{len(group)},runonce={int(runonce)}",
+                MODES_STRATEGY, tickers=group, runonce=runonce)
+
+    # optimization with 1..N processes
+    for cpus in range(1, (maxcpus or multiprocessing.cpu_count()) + 1):
+        add("optimize", f"maxcpus={cpus}", OPT_STRATEGY, params=OPT_PARAMS,
+            maxcpus=cpus)
+
+    return cases
+
+
+def _load_strategy(name: str):
+    for module in ("trading.traditional_strategies", "trading.ai_strategies"):
+        module = importlib.import_module(module)
+        if hasattr(module, name):
+            return getattr(module, name)
+
+    raise ValueError(f"Unknown strategy: {name}")
+
+
+def _dqn_agent(ticker: str):
+    # as loaded by the Backtesting page
+    from trading.rl_module import DQNAgent
+
+    agent = DQNAgent.load(os.path.join(MODEL_DIR, f"{ticker}_DQN_model.pth"))
+    agent.epsilon = 0.0  # no random actions, to have repeatable runs
+    return agent
+
+
+def _peak_rss() -> float:
+    # MB, of this process and of its (finished) children (optimization)
+    if resource is None:
+        return None
+
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    if sys.platform == "darwin":  # bytes instead of kilobytes
+        peak /= 1024
+
+    return peak / 1024
+
+
+def run_case(case: dict) -> dict:
+    """
+    Runs a case and returns its measurements:
+
+    - runs: number of backtests (more than 1 when optimizing)
+    - bars: bars delivered to the strategies (all datas, all runs)
+    - seconds: time taken by ``cerebro.run``
+    - bars_per_sec: bars / seconds
+    - first_bar: seconds from the call to ``cerebro.run`` to the first bar
+      delivered to a strategy
+    - peak_rss_mb: peak resident memory of the process (and of the
+      optimization workers)
+    - runonce, preload: the modes actually used by cerebro (``exactbars``
+      can turn them off)
+
+    Reads the models from ``./model`` and the strategies log to ``./log``,
+    like the app does.
+    """
+    strategy = _load_strategy(case["strategy"])
+    params = dict(case["params"])
+    if case["strategy"] == "DQNStrategy":
+        params["model"] = _dqn_agent(case["tickers"][0])
+
+    cerebro = bt.Cerebro(**case["cerebro"])
+    for ticker in case["tickers"]:
+        if case["datafile"] == "predictions":
+            path = os.path.join(DATA_DIR, "predictions", f"{ticker}.csv")
+        else:
+            path = os.path.join(DATA_DIR, f"all_{ticker}.csv")
+
+        df = pd.read_csv(path, parse_dates=["Date"], index_col="Date")
+        feed = PandasData_Customized(dataname=df, openinterest=None,
+                                     timeframe=bt.TimeFrame.Days)
+        cerebro.adddata(feed, name=ticker)
+
+    optimize = case["group"] == "optimize"
+    if optimize:
+        cerebro.optstrategy(strategy, **params)
+    else:
+        cerebro.addstrategy(strategy, **params)
+
+    cerebro.broker.setcash(CASH)
+    cerebro.broker.setcommission(commission=COMMISSION)
+    cerebro.addsizer(bt.sizers.PercentSizer, percents=PERCENTS)
+    cerebro.addanalyzer(BarClock, _name="barclock")
+
+    t0 = time.time()
+    results = cerebro.run()
+    seconds = time.time() - t0
+
+    for worker in multiprocessing.active_children():
+        worker.join()  # to account for their memory in RUSAGE_CHILDREN
+
+    runs = results if optimize else [results]
+    clocks = [strat.analyzers.barclock.get_analysis()
+              for run in runs for strat in run]
+    bars = sum(x.bars for x in clocks)
+    firsts = [x.first for x in clocks if x.first is not None]
+
+    return dict(
+        runs=len(runs),
+        bars=bars,
+        seconds=seconds,
+        bars_per_sec=bars / seconds,
+        first_bar=min(firsts) - t0 if firsts else None,
+        peak_rss_mb=_peak_rss(),
+        runonce=bool(cerebro._dorunonce),
+        preload=bool(cerebro._dopreload),
+    )
@@ -0,0 +1,24 @@
+"""
+Runs a single benchmark case in a process of its own, to measure its peak
+memory in isolation::
+
+    python -m benchmarks.worker <case as JSON> <output file>
+
+The measurements (see ``benchmarks.cases.run_case``) are written as JSON to
+the output file, as the strategies print to the standard output.
+"""
+import json
+import sys
+
+from benchmarks.cases import run_case
+
+
+def main(argv: list) -> None:
+    case, output = argv
+    result = run_case(json.loads(case))
+    with open(output, "w") as f:
+        json.dump(result, f)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -157,8 +157,7 @@ if st.sidebar.button("Run Backtest"):
         if not os.path.exists(model_path):
             st.error(f"Model for {stock_ticker} not found. Train the model first.")
         else:
-            agent = DQNAgent(11, 3)
-            agent.model.load_state_dict(torch.load(model_path ))
+            agent = DQNAgent.load(model_path)
             trader.add_strategy(DQNStrategy, {"model": agent})
     else:
         trader.add_strategy(selected_strategy, strategy_params)
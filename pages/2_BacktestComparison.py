@@ -200,8 +200,7 @@ if st.sidebar.button("Run and Compare Backtests"):
             if not os.path.exists(model_path):
                 st.error(f"DQN Model for {config['stock_ticker']} not found. Train the model first.")
             else:
-                agent = DQNAgent(11, 3)
-                agent.model.load_state_dict(torch.load(model_path ))
+                agent = DQNAgent.load(model_path)
                 trader.add_strategy(DQNStrategy, {"model": agent})
         else:
             trader.add_strategy(config["selected_strategy"], params=config["strategy_params"])
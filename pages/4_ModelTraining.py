@@ -14,6 +14,7 @@ from trading.trader import *
 from trading.traditional_strategies import *
 from trading.ai_strategies import *
 from trading.rl_module import *
+from trading.training import train_dqn
 import warnings
 warnings.filterwarnings("ignore")
 
@@ -242,60 +243,29 @@ if st.button("Start training"):
     
     # Training DQN model
     elif selected_model == "DQN":
-        def train_dqn(stock_ticker):
+        def train_dqn_model(stock_ticker):
             data = pd.read_csv(f"./data/us_stock/all_{stock_ticker}.csv")
             data['Date'] = pd.to_datetime(data['Date'])
             data.set_index('Date', inplace=True)
 
-            # Initialize trading environment
-            env = TradingEnv(data)
-            state_size = env.observation_space.shape[0]
-            action_size = env.action_space.n
-
-            # Initialize DQN agent
-            agent = DQNAgent(state_size, action_size)
-
-            # Parameters for training
-            episodes = 200
-            batch_size = 32
-
             # Initialize Streamlit progress bar and status
             progress_bar = st.progress(0)  # Progress bar
             status_text = st.empty()  # Placeholder for status updates
-            total_steps = episodes
-
-            for e in range(episodes):
-                state = env.reset()
-                total_reward = 0
 
-                for time in range(env.max_steps):
-                    action = agent.act(state)
-                    next_state, reward, done, _ = env.step(action)
-                    agent.remember(state, action, reward, next_state, done)
-                    state = next_state
-                    total_reward += reward
-
-                    if done:
-                        break
-
-                # Replay experiences and update the model
-                agent.replay(batch_size)
-
-                # Update progress bar and status text
-                progress = (e + 1) / total_steps
-                progress_bar.progress(progress)
-                status_text.text(f"Episode {e + 1}/{episodes}, Total Reward: {total_reward}")
+            def progress(fraction, message=""):
+                progress_bar.progress(fraction)
+                status_text.text(message)
 
-            # Save the trained model
-            model_file_path = f"./model/{stock_ticker}_DQN_model.pth"
-            torch.save(agent.model.state_dict(), model_file_path)
+            # Same training as the job runner (python -m trading.training),
+            # on the features of DQNStrategy, saved to ./model
+            train_dqn(stock_ticker, data, "./model", progress, episodes=200, batch_size=32)
             status_text.text("")  # Clear status text
             progress_bar.empty()  # Clear progress bar
 
         try:
             # Start training
             training_status.info("DQN training started...")
-            train_dqn(stock_ticker)
+            train_dqn_model(stock_ticker)
             training_status.success(f"DQN model trained and saved for {stock_ticker}!")
         except Exception as e:
             st.error(f"An error occurred: {e}")
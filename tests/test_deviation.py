@@ -0,0 +1,70 @@
+"""
+StandardDeviation (and BollingerBands, built on it) give the same values in
+runonce and in next mode.
+
+The two modes add up the windows of the moving averages differently (whole
+windows in runonce, running sums in next), so the values can differ in the
+last bits. ``meansq - sqmean`` scales those differences with the square of the
+prices, which gives differences of about 1e-11 for prices in the hundreds.
+
+A gap (nan) in the prices makes the windows which hold it nan in both modes,
+and only those: the running sums of next mode start over once it has left.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import backtrader as bt
+
+DATA = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                    "data", "us_stock", "all_AAPL.csv")
+
+TOLERANCE = 1e-8  # absolute, on values of the order of 1 to 10
+
+
+def run(runonce, indicator, gap=None, **kwargs):
+    class St(bt.Strategy):
+        def __init__(self):
+            self.ind = indicator(self.data, **kwargs)
+
+    df = pd.read_csv(DATA, parse_dates=["Date"], index_col="Date")
+    if gap is not None:
+        df.iloc[gap, df.columns.get_loc("Close")] = np.nan
+
+    cerebro = bt.Cerebro(runonce=runonce, stdstats=False)
+    cerebro.adddata(bt.feeds.PandasData(dataname=df))
+    cerebro.addstrategy(St)
+    strategy = cerebro.run()[0]
+    return [np.array(line.array) for line in strategy.ind.lines]
+
+
+@pytest.mark.parametrize("indicator, kwargs", [
+    (bt.ind.StdDev, dict(period=20)),
+    (bt.ind.StdDev, dict(period=30, movav=bt.ind.EMA)),
+    (bt.ind.StdDev, dict(period=20, safepow=False)),
+    (bt.ind.BollingerBands, dict()),
+])
+def test_runonce_matches_next(indicator, kwargs):
+    for once, nxt in zip(run(True, indicator, **kwargs), run(False, indicator, **kwargs)):
+        assert len(once) == len(nxt)
+        np.testing.assert_array_equal(np.isnan(once), np.isnan(nxt))
+        np.testing.assert_allclose(once, nxt, rtol=0, atol=TOLERANCE, equal_nan=True)
+
+
+@pytest.mark.parametrize("indicator, kwargs", [
+    (bt.ind.SumN, dict(period=5)),
+    (bt.ind.SMA, dict(period=5)),
+    (bt.ind.StdDev, dict(period=20)),
+])
+def test_gap(indicator, kwargs):
+    gap = 10
+    once, nxt = run(True, indicator, gap, **kwargs)[0], run(False, indicator, gap, **kwargs)[0]
+    np.testing.assert_array_equal(np.isnan(once), np.isnan(nxt))
+    np.testing.assert_allclose(once, nxt, rtol=0, atol=TOLERANCE, equal_nan=True)
+
+    # nan only in the windows which hold the gap
+    period = kwargs["period"]
+    assert np.isnan(nxt[gap:gap + period]).all()
+    assert not np.isnan(nxt[gap + period:]).any()
@@ -0,0 +1,78 @@
+"""
+The entries of the indicator cache on disk (``indcache``) are keyed by the
+code of the modules of the indicators, including the helpers they call.
+"""
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+import backtrader as bt
+from backtrader import indcache
+from backtrader.indcache import IndicatorCache
+
+DATA = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                    "data", "us_stock", "all_AAPL.csv")
+
+
+def double(x):
+    return 2.0 * x
+
+
+class Double(bt.Indicator):
+    lines = ('x',)
+
+    def once(self, start, end):
+        for i in range(start, end):
+            self.lines.x.array[i] = double(self.data.array[i])
+
+
+class St(bt.Strategy):
+    def __init__(self):
+        self.sma = bt.ind.SMA(self.data, period=10)
+        self.double = Double(self.data)
+
+
+def run(path):
+    df = pd.read_csv(DATA, parse_dates=["Date"], index_col="Date")
+    cerebro = bt.Cerebro(indcache=path, stdstats=False)
+    cerebro.adddata(bt.feeds.PandasData(dataname=df))
+    cerebro.addstrategy(St)
+    return cerebro.run()[0]
+
+
+def test_hit(tmp_path):
+    first, second = run(str(tmp_path)), run(str(tmp_path))
+    assert os.listdir(str(tmp_path))
+    for ind in ("sma", "double"):
+        np.testing.assert_array_equal(np.asarray(getattr(first, ind).array),
+                                      np.asarray(getattr(second, ind).array))
+
+
+def keys(strategy, path):
+    cache = IndicatorCache(path)
+    return cache.key(strategy.sma), cache.key(strategy.double)
+
+
+def edit(monkeypatch, module):
+    monkeypatch.setitem(indcache._sources, sys.modules[module], "edited")
+
+
+def test_package_helpers(tmp_path, monkeypatch):
+    strategy = run(None)
+    sma, double = keys(strategy, str(tmp_path))
+    assert sma is not None and double is not None
+
+    edit(monkeypatch, "backtrader.indicators.basicops")  # Average of SMA
+    new_sma, new_double = keys(strategy, str(tmp_path))
+    assert new_sma != sma and new_double != double
+
+
+def test_module_helpers(tmp_path, monkeypatch):
+    strategy = run(None)
+    sma, double = keys(strategy, str(tmp_path))
+
+    edit(monkeypatch, __name__)  # double, called by Double
+    new_sma, new_double = keys(strategy, str(tmp_path))
+    assert new_sma == sma and new_double != double
@@ -0,0 +1,38 @@
+"""
+The indicator object cache of Cerebro (``objcache=True``) does not change the
+results, also across the runs of an optimization in the same process.
+"""
+import os
+
+import pandas as pd
+import pytest
+
+import backtrader as bt
+
+DATA = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                    "data", "us_stock", "all_AAPL.csv")
+
+
+class St(bt.Strategy):
+    params = dict(fast=5, slow=20)
+
+    def __init__(self):
+        self.diff = bt.ind.SMA(period=self.p.fast) - bt.ind.SMA(period=self.p.slow)
+        self.total = 0.0
+
+    def next(self):
+        self.total += self.diff[0]
+
+
+def optimize(objcache, runonce):
+    df = pd.read_csv(DATA, parse_dates=["Date"], index_col="Date")
+    cerebro = bt.Cerebro(objcache=objcache, runonce=runonce, maxcpus=1,
+                         optreturn=False, stdstats=False)
+    cerebro.adddata(bt.feeds.PandasData(dataname=df))
+    cerebro.optstrategy(St, fast=[5], slow=[20, 30])
+    return [strategies[0].total for strategies in cerebro.run()]
+
+
+@pytest.mark.parametrize("runonce", [True, False])
+def test_optimization(runonce):
+    assert optimize(True, runonce) == pytest.approx(optimize(False, runonce))
@@ -0,0 +1,56 @@
+"""
+An optimization which fails in a worker process puts the datas back in the
+memory of the process and releases the shared memory block holding them, and
+keeps the results of the finished runs in its store.
+"""
+import os
+
+import pandas as pd
+import pytest
+
+import backtrader as bt
+from backtrader.linebuffer import SharedStorage
+
+DATA = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                    "data", "us_stock", "all_AAPL.csv")
+
+
+class Fail(bt.Strategy):
+    params = dict(run=0, failing=1)
+
+    def next(self):
+        if self.p.run == self.p.failing:
+            raise RuntimeError("failed")
+
+
+def optimize(failing=1, **kwargs):
+    df = pd.read_csv(DATA, parse_dates=["Date"], index_col="Date")
+    kwargs = dict(dict(maxcpus=2, optshared=True), **kwargs)
+    cerebro = bt.Cerebro(stdstats=False, **kwargs)
+    data = bt.feeds.PandasData(dataname=df)
+    cerebro.adddata(data)
+    cerebro.optstrategy(Fail, run=[0, 1, 2], failing=failing)
+    with pytest.raises(RuntimeError, match="failed"):
+        cerebro.run()
+
+    return data
+
+
+def released(data):
+    return not SharedStorage._blocks and \
+        not any(isinstance(line.array, SharedStorage) for line in data.lines)
+
+
+def test_pool():
+    assert released(optimize())
+
+
+def test_optpool():
+    with bt.OptPool(processes=2) as pool:
+        assert released(optimize(optpool=pool))
+
+
+def test_store(tmp_path):
+    store = bt.SQLiteOptStore(dbname=str(tmp_path / "optresults.db"))
+    optimize(2, maxcpus=1, optstore=store)
+    assert list(store.read()["run"]) == [0, 1]
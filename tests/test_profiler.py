@@ -0,0 +1,83 @@
+"""
+The profiler of Cerebro (``profile=True``) puts back all the methods it times,
+also with indicators shared across strategies (``objcache=True``).
+"""
+import os
+
+import pandas as pd
+import pytest
+
+import backtrader as bt
+from backtrader.lineiterator import LineIterator
+from backtrader.profiler import Profiler
+
+DATA = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                    "data", "us_stock", "all_AAPL.csv")
+
+
+class Wrap(bt.Indicator):
+    lines = ('x',)
+
+    def __init__(self):
+        self.lines.x = bt.ind.SMA(self.data, period=10) * 1.0
+
+
+class St(bt.Strategy):
+    def __init__(self):
+        self.sma = bt.ind.SMA(self.data, period=10)
+        self.wrap = Wrap(self.data)
+        self.rsi = bt.ind.RSI(self.data)
+
+
+def tree(obj):
+    yield obj
+    children = list(getattr(obj, '_lineiterators', {}).get(LineIterator.IndType, []))
+    children += list(getattr(obj, '_sharedinds', []))
+    for child in children:
+        for x in tree(child):
+            yield x
+
+
+def timed(obj):
+    # methods of the profiler left on the object
+    return [attr for attr, value in vars(obj).items()
+            if getattr(value, '__name__', '') == 'timed']
+
+
+@pytest.mark.parametrize("runonce", [True, False])
+def test_objcache_two_strategies(runonce):
+    df = pd.read_csv(DATA, parse_dates=["Date"], index_col="Date")
+    cerebro = bt.Cerebro(objcache=True, profile=True, runonce=runonce, stdstats=False)
+    cerebro.adddata(bt.feeds.PandasData(dataname=df))
+    cerebro.addstrategy(St)
+    cerebro.addstrategy(St)
+    strategies = cerebro.run()
+
+    for strategy in strategies:
+        for obj in tree(strategy):
+            assert timed(obj) == []
+
+    profile = strategies[0].profile
+    names = set(row['name'] for row in profile if row['kind'] == 'strategy')
+    assert names == {'St #0', 'St #1'}
+
+    rows = [(row['kind'], row['name'], row['owner'], row['method']) for row in profile]
+    calls = [row['calls'] for row in profile if row['kind'] == 'strategy' and row['method'] == 'next']
+    assert len(calls) == 2 and calls[0] == calls[1]
+    assert len([x for x in rows if x[0] == 'broker']) == 1
+
+
+def test_wrap_twice():
+    class Obj(object):
+        def next(self):
+            return 1
+
+    obj = Obj()
+    profiler = Profiler()
+    profiler.wrap(obj, 'next', 'indicator', 'a')
+    profiler.wrap(obj, 'next', 'indicator', 'b')
+    assert obj.next() == 1
+
+    profile = profiler.stop()
+    assert 'next' not in vars(obj)
+    assert [(row['name'], row['calls']) for row in profile] == [('a', 1)]
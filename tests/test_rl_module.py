@@ -0,0 +1,166 @@
+"""
+``VecTradingEnv`` steps its episodes like separate ``TradingEnv`` instances,
+the ``ReplayBuffer`` of ``DQNAgent`` is a ring and ``DQNAgent.replay`` moves
+the Q-value of the action taken to the Q-learning target.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("gym")
+torch = pytest.importorskip("torch")
+
+from trading.rl_module import DQNAgent, ReplayBuffer, TradingEnv, VecTradingEnv
+
+DATA = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                    "data", "us_stock", "all_AAPL.csv")
+
+
+@pytest.fixture(scope="module")
+def df():
+    df = pd.read_csv(DATA, parse_dates=["Date"], index_col="Date")
+    return df[["Open", "High", "Low", "Close", "Volume"]]
+
+
+def separate(datas, starts, actions, account):
+    # the steps of a TradingEnv per episode, reset when done
+    envs = [TradingEnv(data.iloc[start:], account=account)
+            for data, start in zip(datas, starts)]
+    first = np.array([env.reset() for env in envs])
+    steps = []
+    for row in actions:
+        observations, rewards, dones, finals = [], [], [], []
+        for env, action in zip(envs, row):
+            observation, reward, done, _ = env.step(action)
+            finals.append(observation)
+            if done:
+                observation = env.reset()
+
+            observations.append(observation)
+            rewards.append(reward)
+            dones.append(done)
+
+        steps.append((np.array(observations), np.array(rewards),
+                      np.array(dones), np.array(finals)))
+
+    return first, steps
+
+
+@pytest.mark.parametrize("account", [True, False])
+@pytest.mark.parametrize("frames, starts", [
+    ([slice(0, 25), slice(40, 58)], [0, 4]),  # frames of different lengths
+    ([slice(0, 20)], [0, 3, 10]),  # offsets in a single frame
+])
+def test_matches_trading_env(df, account, frames, starts):
+    datas = [df.iloc[x] for x in frames]
+    if len(datas) == 1:
+        datas = datas * len(starts)
+
+    n = len(starts)
+    rng = np.random.default_rng(0)
+    actions = rng.integers(0, 3, size=(60, n))  # several episodes of each
+
+    vec = VecTradingEnv(datas, starts, account=account)
+    first, steps = separate(datas, starts, actions, account)
+    np.testing.assert_array_equal(vec.reset(), first)
+
+    ndones = 0
+    for row, (observations, rewards, dones, finals) in zip(actions, steps):
+        observation, reward, done, info = vec.step(row)
+        np.testing.assert_array_equal(observation, observations)
+        np.testing.assert_array_equal(reward, rewards)
+        np.testing.assert_array_equal(done, dones)
+        if done.any():
+            np.testing.assert_array_equal(info["final_observation"][done], finals[done])
+        else:
+            assert "final_observation" not in info
+
+        ndones += done.sum()
+
+    assert ndones >= 2 * n
+
+
+def transitions(values):
+    # one transition per value, with the value in all the fields
+    values = np.asarray(values)
+    states = np.column_stack([values, values])
+    return states, values, values.astype(float), states + 1, values % 2 == 1
+
+
+def test_ring():
+    memory = ReplayBuffer(3, 2)
+    memory.add(*[x[0] for x in transitions([1])])
+    memory.extend(*transitions([2]))
+    assert len(memory) == 2 and memory.position == 2
+
+    memory.extend(*transitions([3, 4]))  # across the end, overwrites 1
+    assert len(memory) == 3 and memory.position == 1
+    states, actions, rewards, next_states, dones = transitions([4, 2, 3])
+    np.testing.assert_array_equal(memory.states, states)
+    np.testing.assert_array_equal(memory.actions, actions)
+    np.testing.assert_array_equal(memory.rewards, rewards)
+    np.testing.assert_array_equal(memory.next_states, next_states)
+    np.testing.assert_array_equal(memory.dones, dones)
+
+
+def test_sample():
+    memory = ReplayBuffer(10, 2, seed=0)
+    memory.extend(*transitions(range(5)))
+    for _ in range(20):  # without replacement, only from the filled part
+        assert sorted(memory.sample(5)[1]) == list(range(5))
+
+    with pytest.raises(ValueError):
+        memory.sample(6)
+
+
+def replay(agent, transition):
+    # replays a memory holding a single transition and returns the Q-values
+    # of its state and the targets given to the loss
+    agent.memory = ReplayBuffer(1, agent.state_size)
+    agent.remember(*transition)
+
+    calls = []
+    criterion = agent.criterion
+
+    def capture(output, target):
+        calls.append((output.detach().numpy().copy(), target.numpy().copy()))
+        return criterion(output, target)
+
+    agent.criterion = capture
+    agent.replay(1)
+    agent.criterion = criterion
+    (output, target), = calls
+    return output[0], target[0]
+
+
+@pytest.mark.parametrize("done", [False, True])
+def test_replay_target(done):
+    torch.manual_seed(0)
+    agent = DQNAgent(2, 3)
+    state, next_state = np.array([0.5, -1.0]), np.array([1.0, 2.0])
+    next_q = agent.q_values([next_state])[0].max()
+
+    output, target = replay(agent, (state, 1, 0.25, next_state, done))
+    expected = 0.25 if done else 0.25 + agent.gamma * next_q
+    assert target[1] == pytest.approx(expected, rel=1e-6)
+    np.testing.assert_array_equal(target[[0, 2]], output[[0, 2]])  # other actions
+
+
+def test_target_update():
+    torch.manual_seed(0)
+    agent = DQNAgent(2, 3, target_update=3)
+    state, next_state = np.array([0.5, -1.0]), np.array([1.0, 2.0])
+
+    def synced():
+        return all(torch.equal(x, y) for x, y in zip(
+            agent.model.state_dict().values(), agent.target_model.state_dict().values()))
+
+    for replays in range(1, 7):
+        with torch.no_grad():  # the next Q-values come from the target network
+            next_q = agent.target_model(torch.as_tensor(next_state, dtype=torch.float32)).max().item()
+
+        output, target = replay(agent, (state, 0, 1.0, next_state, False))
+        assert target[0] == pytest.approx(1.0 + agent.gamma * next_q, rel=1e-6)
+        assert synced() == (replays % 3 == 0)
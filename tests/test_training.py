@@ -0,0 +1,62 @@
+"""
+A DQN model trained by ``trading.training.train_dqn`` runs in ``DQNStrategy``,
+which gives the agent back in the mode it had.
+"""
+import os
+
+import pytest
+
+torch = pytest.importorskip("torch")
+
+import backtrader as bt
+from trading.ai_strategies import DQNStrategy, selected_features
+from trading.rl_module import DQNAgent
+from trading.training import load_data, train_dqn
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                        "data", "us_stock")
+
+
+@pytest.fixture(autouse=True)
+def logdir(tmp_path, monkeypatch):
+    # the strategies log to ./log/trading_log.txt
+    (tmp_path / "log").mkdir()
+    monkeypatch.chdir(tmp_path)
+
+
+@pytest.fixture(scope="module")
+def data():
+    return load_data("AAPL", "2020-01-01", "2021-01-01", data_dir=DATA_DIR)
+
+
+@pytest.fixture(scope="module")
+def model_path(data, tmp_path_factory):
+    model_dir = str(tmp_path_factory.mktemp("model"))
+    train_dqn("AAPL", data, model_dir, episodes=2, batch_size=8)
+    return os.path.join(model_dir, "AAPL_DQN_model.pth")
+
+
+def test_state_size(model_path):
+    agent = DQNAgent.load(model_path)
+    assert agent.state_size == len(selected_features)
+
+
+@pytest.mark.parametrize("batch", [True, False])
+def test_backtest(data, model_path, batch):
+    agent = DQNAgent.load(model_path)
+    cerebro = bt.Cerebro()
+    cerebro.adddata(bt.feeds.PandasData(dataname=data))
+    cerebro.addstrategy(DQNStrategy, model=agent, batch=batch)
+    strat, = cerebro.run()
+    assert len(strat) == len(data)
+
+
+def test_agent_mode(data, model_path):
+    agent = DQNAgent.load(model_path)
+    agent.epsilon = 0.5
+    agent.model.train()
+    cerebro = bt.Cerebro()
+    cerebro.adddata(bt.feeds.PandasData(dataname=data))
+    cerebro.addstrategy(DQNStrategy, model=agent)
+    cerebro.run()
+    assert agent.epsilon == 0.5 and agent.model.training
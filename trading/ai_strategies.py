@@ -1,10 +1,71 @@
 from trading.base_strategy import *
 import joblib
-from trading.utils import calculate_indicators_bt
+from trading.utils import calculate_indicators_bt, calculate_indicators_df
 import numpy as np
 
 selected_features = ['Close', 'SMA_10', 'SMA_50', 'Momentum', 'RSI', 'MACD', 'BB_Middle', 'BB_Upper', 'BB_Lower']
 
+
+def selected_features_df(df):
+    """
+    Returns the selected features of a price frame (as calculated for the
+    training of the models), one row per bar, in the order of the state of
+    ``DQNStrategy``.
+    """
+    return calculate_indicators_df(df.copy())[selected_features]
+
+
+def feature_matrix(datas, start, end):
+    """
+    Returns the values of the datas (lines) from ``start`` to ``end`` (buffer
+    indices, as in ``once``) as the columns of a matrix, one row per bar.
+    """
+    columns = [data.ndarray() for data in datas]
+    if any(column is None for column in columns):
+        columns = [data.array for data in datas]
+
+    return np.column_stack(
+        [np.asarray(column[start:end], dtype=float) for column in columns])
+
+
+class MLPrediction(bt.Indicator):
+    """
+    Prediction of a scikit-learn model (after scaling) for the features given
+    as datas, one column per data.
+
+    In vectorized mode (runonce) the feature matrix of all the bars is built
+    at once and the scaler and the model are called a single time, instead of
+    once per bar. Row t only holds the values of the features at bar t, so
+    the prediction of a bar does not look ahead.
+    """
+    lines = ('prediction',)
+    params = dict(
+        scaler=None,
+        model=None,
+    )
+
+    def predict(self, features):
+        return self.p.model.predict(self.p.scaler.transform(features))
+
+    def next(self):
+        features = [[data[0] for data in self.datas]]
+        self.lines.prediction[0] = self.predict(features)[0]
+
+    def once(self, start, end):
+        if start >= end:
+            return
+
+        predictions = self.predict(feature_matrix(self.datas, start, end))
+
+        dst = self.lines.prediction.ndarray()
+        if dst is not None:
+            dst[start:end] = predictions
+        else:
+            dst = self.lines.prediction.array
+            for i, prediction in zip(range(start, end), predictions):
+                dst[i] = prediction
+
+
 class MLTradingStrategy(BaseStrategy):
     """
     A strategy that uses a machine learning model to predict buy/sell signals,
@@ -13,6 +74,7 @@ class MLTradingStrategy(BaseStrategy):
     params = dict(
         model_name='Logistic_Regression',  # Choose between 'logistic' and 'gradient_boosting'
         stock_ticker='AAPL',  # Default stock ticker
+        batch=True,  # Predict all the bars at once with MLPrediction (runonce)
     )
 
     def __init__(self):
@@ -31,10 +93,19 @@ class MLTradingStrategy(BaseStrategy):
         self.indicators = calculate_indicators_bt(self.data)
         self.selected_features = selected_features  
 
+        self.prediction = None
+        if self.params.batch:
+            self.prediction = MLPrediction(
+                *[self.indicators[feature] for feature in self.selected_features],
+                scaler=self.scaler, model=self.model)
+
     def next(self):
-        features = [[self.indicators[feature][0] for feature in self.selected_features]]
-        features = self.scaler.transform(features)
-        prediction = self.model.predict(features)[0]
+        if self.prediction is not None:
+            prediction = self.prediction[0]
+        else:
+            features = [[self.indicators[feature][0] for feature in self.selected_features]]
+            features = self.scaler.transform(features)
+            prediction = self.model.predict(features)[0]
 
         if not self.position:
             if prediction == 1:
@@ -65,25 +136,88 @@ class RNNStrategy(BaseStrategy):
                 self.log(f'SELL CREATE {self.data.close[0]:.2f}')
 
 
+class DQNAction(bt.Indicator):
+    """
+    Greedy action (highest Q-value) of a ``DQNAgent`` for the state made of
+    the features given as datas, one column per data.
+
+    In vectorized mode (runonce) the Q-values of all the bars are calculated
+    in a single batched forward pass. Row t only holds the values of the
+    features at bar t, so the action of a bar does not look ahead.
+    """
+    lines = ('action',)
+    params = dict(
+        agent=None,
+    )
+
+    def next(self):
+        state = [[data[0] for data in self.datas]]
+        self.lines.action[0] = self.p.agent.q_values(state)[0].argmax()
+
+    def once(self, start, end):
+        if start >= end:
+            return
+
+        states = feature_matrix(self.datas, start, end)
+        actions = self.p.agent.q_values(states).argmax(axis=1)
+
+        dst = self.lines.action.ndarray()
+        if dst is not None:
+            dst[start:end] = actions
+        else:
+            dst = self.lines.action.array
+            for i, action in zip(range(start, end), actions):
+                dst[i] = action
+
+
 class DQNStrategy(BaseStrategy):
-    params = (("model", None),)
+    """
+    Trades with the actions of a ``DQNAgent`` (param ``model``) whose state is
+    the ``selected_features`` of the bar. The agent is put in inference mode
+    (eval, no random actions) for the backtest and given back in the mode and
+    with the epsilon it had when the backtest stops, so that an agent still
+    being trained keeps exploring.
+    """
+    params = (
+        ("model", None),
+        ("batch", True),  # Calculate the actions of all the bars at once with DQNAction (runonce)
+    )
     def __init__(self):
         self.model = self.params.model
         self.selected_features = selected_features
 
+        if self.model.state_size != len(self.selected_features):
+            raise ValueError(
+                f"The DQN model takes {self.model.state_size} inputs, "
+                f"but the strategy has {len(self.selected_features)} features. "
+                f"Train it on selected_features_df(data) without account")
+
+        # Deterministic actions (no exploration) and no autograd, until stop
+        self._agent_mode = (self.model.model.training, self.model.epsilon)
+        self.model.inference()
+
         # Calculate indicators for Backtrader data
         self.indicators = calculate_indicators_bt(self.data)
         for ind in self.indicators:
             setattr(self, ind, self.indicators[ind])
 
+        self.action = None
+        if self.params.batch:
+            self.action = DQNAction(
+                *[self.indicators[feature] for feature in self.selected_features],
+                agent=self.model)
+
     def next(self):
-        # Extract the selected features for the current timestep
-        state = np.array([
-            getattr(self, feature)[0] for feature in self.selected_features
-        ])
+        if self.action is not None:
+            action = self.action[0]
+        else:
+            # Extract the selected features for the current timestep
+            state = np.array([
+                getattr(self, feature)[0] for feature in self.selected_features
+            ])
 
-        # Get the action from the DQN model
-        action = self.model.act(state)
+            # Get the action from the DQN model
+            action = self.model.act(state)
 
         # Execute the action
         if action == 1:  # Buy
@@ -91,4 +225,9 @@ class DQNStrategy(BaseStrategy):
                 self.buy(size=100)
         elif action == 2:  # Sell
             if self.position:
-                self.sell(size=100)
\ No newline at end of file
+                self.sell(size=100)
+
+    def stop(self):
+        # Give the agent back in its previous mode
+        training, self.model.epsilon = self._agent_mode
+        self.model.model.train(training)
@@ -0,0 +1,218 @@
+"""
+Lanes mode for parameter sweeps.
+
+``Cerebro.optstrategy`` runs a full backtest for each combination of
+parameters. In lanes mode all the combinations ("lanes") of a strategy advance
+together over a single timeline instead:
+
+- The signals of every lane are calculated in one backtrader run, in which
+  the indicators are calculated in vectorized mode, and are kept as 2-D arrays
+  (bars x lanes)
+- ``LaneBroker`` keeps the cash and the position of each lane in arrays and
+  walks the bars once for all lanes
+
+Strategies take part by implementing the classmethod ``lanes(data, p)``, which
+returns the buy and close signals (lines) of one combination of params ``p``.
+The strategy is expected to buy when flat and the buy signal is on, and to
+close the position when long and the close signal is on, which is what
+``NaiveMovingAverage``, ``CrossMovingAverage`` and ``BollingerBands`` do.
+"""
+import itertools
+import math
+
+import backtrader as bt
+import numpy as np
+import pandas as pd
+
+
+class LaneBroker:
+    """
+    Cash and (long) position of each lane, following the rules of the default
+    backtrader broker for market orders:
+
+    - Orders are created with the closing price and executed with the opening
+      price of the next bar
+    - Orders are checked against the cash when submitted (at the creation
+      price) and when executed, and rejected if the cash is not enough
+    - The commission is a percentage of the operation value (stocks)
+
+    The operations are done in the same order as in the backtrader broker, to
+    get the same values.
+    """
+
+    def __init__(self, lanes: int, cash: float = 10000.0,
+                 commission: float = 0.0, percents: float = None,
+                 stake: float = 1):
+        """
+        Sizing is done with ``percents`` of the cash (like
+        ``bt.sizers.PercentSizer``) or else with a fixed ``stake`` (like the
+        default sizer of backtrader).
+        """
+        self.commission = commission
+        self.percents = percents
+        self.stake = stake
+
+        self.cash = np.full(lanes, float(cash))
+        self.size = np.zeros(lanes)  # position size
+        self.price = np.zeros(lanes)  # position price
+        self.pending = np.zeros(lanes)  # size of the order to execute (+/-)
+        self.created = np.zeros(lanes)  # creation price of the order
+        self.trades = np.zeros(lanes, dtype=int)  # closed trades
+
+    def execute(self, popen: float) -> None:
+        """
+        Checks and executes the orders created in the previous bar.
+        """
+        comm = self.commission
+
+        buys = np.flatnonzero(self.pending > 0)
+        if len(buys):
+            # check at submission with the creation price
+            size, price = self.pending[buys], self.created[buys]
+            cash = self.cash[buys] - size * price - size * comm * price
+            buys = buys[cash >= 0.0]
+
+            # execution, if the cash is still enough with the opening price
+            size = self.pending[buys]
+            cash = self.cash[buys] - size * popen - size * comm * popen
+            buys = buys[cash >= 0.0]
+            self.cash[buys] = cash[cash >= 0.0]
+            self.size[buys] = self.pending[buys]
+            self.price[buys] = popen
+
+        sells = np.flatnonzero(self.pending < 0)
+        if len(sells):
+            size, price = self.size[sells], self.price[sells]
+            # value at the position price plus the profit and loss
+            cash = self.cash[sells] + (size * price + size * (popen - price))
+            self.cash[sells] = cash - size * comm * popen
+            self.size[sells] = 0.0
+            self.price[sells] = 0.0
+            self.trades[sells] += 1
+
+        self.pending[:] = 0.0
+
+    def order(self, buy: np.ndarray, close: np.ndarray,
+              pclose: float) -> None:
+        """
+        Creates buy orders for the lanes in ``buy`` and close orders for the
+        lanes in ``close`` (boolean arrays).
+        """
+        if self.percents is not None:
+            size = self.cash[buy] / pclose * (self.percents / 100)
+        else:
+            size = self.stake
+
+        self.pending[buy] = size
+        self.pending[close] = -self.size[close]
+        self.created[buy | close] = pclose
+
+    def getvalue(self, pclose: float) -> np.ndarray:
+        """
+        Returns the value (cash plus position) of each lane.
+        """
+        value = self.cash.copy()
+        longs = self.size > 0
+        size, price = self.size[longs], self.price[longs]
+        unrealized = size * (pclose - price)
+        value[longs] += (size * pclose - unrealized) + unrealized
+        return value
+
+
+class LaneSweep(bt.Strategy):
+    """
+    Creates the signals of all the lanes of ``strategycls``, one for each of
+    the params in ``combos``, to have them calculated in a single run.
+
+    The signals are complete once the indicators have been calculated in
+    vectorized mode, before the 1st bar is delivered. The run is stopped
+    there, rather than advancing all indicators of all lanes bar by bar.
+    """
+    params = dict(strategycls=None, combos=())
+
+    def __init__(self):
+        self.signals = []
+        for combo in self.p.combos:
+            p = self.p.strategycls.params()  # defaults of the strategy
+            for name, value in combo.items():
+                setattr(p, name, value)
+
+            self.signals.append(self.p.strategycls.lanes(self.data, p))
+
+    def prenext(self):
+        self.env.runstop()
+
+    def next(self):
+        self.env.runstop()
+
+
+def run_lanes(strategy, data, grid: dict, cash: float = 10000.0,
+              commission: float = 0.0, percents: float = None,
+              stake: float = 1, **kwargs) -> pd.DataFrame:
+    """
+    Sweeps the params of a strategy over a data feed in lanes mode.
+
+    Parameters:
+    - strategy: strategy class implementing the classmethod ``lanes``.
+    - data (bt.feeds.DataBase): data feed to run the strategy on.
+    - grid (dict): values for each param, expanded like the kwargs of
+      ``Cerebro.optstrategy``.
+    - cash, commission: broker settings.
+    - percents, stake: sizing (see ``LaneBroker``).
+    - kwargs: params for the ``bt.Cerebro`` used to calculate the signals
+      (``preload`` and ``runonce`` are always on).
+
+    Returns:
+    - pd.DataFrame: one row per combination with the params, the ending
+      value, the total (log) return, the maximum drawdown (%) and the number
+      of closed trades.
+    """
+    names = list(grid)
+    values = []
+    for value in grid.values():
+        if isinstance(value, str) or not hasattr(value, "__iter__"):
+            value = [value]
+        values.append(value)
+
+    combos = [dict(zip(names, x)) for x in itertools.product(*values)]
+
+    # the signals are calculated in vectorized mode (see LaneSweep)
+    kwargs.update(stdstats=False, preload=True, runonce=True, exactbars=False)
+    cerebro = bt.Cerebro(**kwargs)
+    cerebro.adddata(data)
+    cerebro.addstrategy(LaneSweep, strategycls=strategy, combos=combos)
+    sweep = cerebro.run()[0]
+
+    # 2-D arrays: bars x lanes
+    bars = sweep.data.buflen()
+    buys = np.column_stack([buy.ndarray()[:bars] != 0
+                            for buy, _ in sweep.signals])
+    closes = np.column_stack([close.ndarray()[:bars] != 0
+                              for _, close in sweep.signals])
+    # 1st bar in which the strategy of each lane would call "next"
+    starts = np.array([max(buy._minperiod, close._minperiod) - 1
+                       for buy, close in sweep.signals])
+
+    popen = np.array(sweep.data.open.ndarray()[:bars])
+    pclose = np.array(sweep.data.close.ndarray()[:bars])
+
+    broker = LaneBroker(len(combos), cash=cash, commission=commission,
+                        percents=percents, stake=stake)
+    values = np.empty((bars, len(combos)))
+    for i in range(bars):
+        broker.execute(popen[i])
+        active = starts <= i
+        flat = broker.size == 0
+        broker.order(active & flat & buys[i], active & ~flat & closes[i],
+                     pclose[i])
+        values[i] = broker.getvalue(pclose[i])
+
+    peaks = np.maximum.accumulate(values, axis=0)
+    drawdowns = 100.0 * (peaks - values) / peaks
+
+    results = pd.DataFrame(combos, columns=names)
+    results["value"] = values[-1]
+    results["rtot"] = [math.log(x / cash) for x in values[-1]]
+    results["maxdrawdown"] = drawdowns.max(axis=0)
+    results["trades"] = broker.trades
+    return results
@@ -1,33 +1,45 @@
 import numpy as np
+import pandas as pd
 import gym
 from gym import spaces
 import torch
 import torch.nn as nn
 import torch.optim as optim
 import random
-from collections import deque
 
 class TradingEnv(gym.Env):
     """
     Custom Trading Environment for Reinforcement Learning.
+
+    The frame is converted once to a contiguous float32 array (the market
+    part of the observations), so that the steps do not look up pandas rows.
+
+    With ``account`` the observations end with the balance and the positions.
+    Without it they only hold the columns of the frame, which is the state of
+    ``DQNStrategy`` when the frame holds its features (``selected_features_df``).
     """
 
-    def __init__(self, data, initial_balance=1000000):
+    def __init__(self, data, initial_balance=1000000, transaction_cost=0.001, account=True):
         super(TradingEnv, self).__init__()
         self.data = data
         self.initial_balance = initial_balance
+        self.transaction_cost = transaction_cost  # Example: 0.1% transaction cost per trade
+        self.account = account
         self.current_step = 0
         self.balance = initial_balance
         self.positions = 0  # Number of stocks held
         self.total_value = initial_balance
         self.max_steps = len(data)
 
+        self.market = np.ascontiguousarray(data.to_numpy(dtype=np.float32))
+        self.prices = data["Close"].to_numpy(dtype=np.float64)
+
         # Action space: 0 (Hold), 1 (Buy), 2 (Sell)
         self.action_space = spaces.Discrete(3)
 
-        # Observation space: OHLCV + balance + positions
+        # Observation space: OHLCV + balance + positions (with account)
         self.observation_space = spaces.Box(
-            low=-np.inf, high=np.inf, shape=(len(data.columns) + 2,), dtype=np.float32
+            low=-np.inf, high=np.inf, shape=(len(data.columns) + 2 * account,), dtype=np.float32
         )
 
     def reset(self):
@@ -38,13 +50,17 @@ class TradingEnv(gym.Env):
         return self._get_observation()
 
     def _get_observation(self):
-        return np.concatenate(
-            [self.data.iloc[self.current_step].values, [self.balance, self.positions]]
-        )
+        if not self.account:
+            return self.market[self.current_step].copy()
+
+        observation = np.empty(self.market.shape[1] + 2, dtype=np.float32)
+        observation[:-2] = self.market[self.current_step]
+        observation[-2:] = self.balance, self.positions
+        return observation
 
     def step(self, action):
-        current_price = self.data.iloc[self.current_step]["Close"]
-        transaction_cost = 0.001  # Example: 0.1% transaction cost per trade
+        current_price = self.prices[self.current_step]
+        transaction_cost = self.transaction_cost
 
         if action == 1:  # Buy
             self.positions += 1
@@ -70,6 +86,108 @@ class TradingEnv(gym.Env):
         print(f"Step: {self.current_step}, Balance: {self.balance}, Positions: {self.positions}, Total Value: {self.total_value}")
 
 
+class VecTradingEnv:
+    """
+    N independent ``TradingEnv`` episodes stepped in lockstep with array
+    operations.
+
+    The episodes run over the given frames (for example one per ticker, with
+    the same columns) and/or start at the given offsets (``starts``, one per
+    episode). A single frame is repeated for all the offsets, and a single
+    offset for all the frames.
+
+    The observations are returned as a (N, columns + 2) float32 array, or
+    (N, columns) without ``account`` (see ``TradingEnv``), and the
+    rewards and the done flags as arrays of N values. The episodes which are
+    done are reset right away (their observation is the first one of the new
+    episode) and their last observation is in ``info["final_observation"]``.
+    """
+
+    def __init__(self, datas, starts=None, initial_balance=1000000,
+                 transaction_cost=0.001, account=True):
+        if isinstance(datas, pd.DataFrame):
+            datas = [datas]
+        starts = [0] if starts is None else list(starts)
+        if len(datas) == 1:
+            datas = list(datas) * len(starts)
+        elif len(starts) == 1:
+            starts = starts * len(datas)
+        if len(datas) != len(starts):
+            raise ValueError("The number of frames and of starts differ")
+
+        self.num_envs = n = len(datas)
+        self.initial_balance = initial_balance
+        self.transaction_cost = transaction_cost
+        self.account = account
+        self.starts = np.array(starts, dtype=np.int64)
+        self.max_steps = np.array([len(data) for data in datas], dtype=np.int64)
+        if (self.starts >= self.max_steps - 1).any():
+            raise ValueError("The episodes need at least 2 rows after the start")
+
+        # Market values and close prices of the episodes (padded to the
+        # longest frame)
+        columns = datas[0].shape[1]
+        self.market = np.zeros((n, self.max_steps.max(), columns), dtype=np.float32)
+        self.prices = np.zeros((n, self.max_steps.max()), dtype=np.float64)
+        for i, data in enumerate(datas):
+            self.market[i, :len(data)] = data.to_numpy(dtype=np.float32)
+            self.prices[i, :len(data)] = data["Close"].to_numpy(dtype=np.float64)
+
+        self.action_space = spaces.Discrete(3)
+        self.observation_space = spaces.Box(
+            low=-np.inf, high=np.inf, shape=(columns + 2 * account,), dtype=np.float32
+        )
+
+        self._envs = np.arange(n)
+        self.reset()
+
+    def reset(self):
+        self.current_step = self.starts.copy()
+        self.balance = np.full(self.num_envs, float(self.initial_balance))
+        self.positions = np.zeros(self.num_envs, dtype=np.int64)
+        self.total_value = self.balance.copy()
+        return self._get_observation()
+
+    def _get_observation(self):
+        if not self.account:
+            return self.market[self._envs, self.current_step]
+
+        observation = np.empty((self.num_envs, self.market.shape[2] + 2), dtype=np.float32)
+        observation[:, :-2] = self.market[self._envs, self.current_step]
+        observation[:, -2] = self.balance
+        observation[:, -1] = self.positions
+        return observation
+
+    def step(self, actions):
+        actions = np.asarray(actions)
+        current_price = self.prices[self._envs, self.current_step]
+
+        buy = actions == 1
+        sell = (actions == 2) & (self.positions > 0)
+        self.positions += buy
+        self.positions -= sell
+        self.balance -= np.where(buy, current_price * (1 + self.transaction_cost), 0.0)
+        self.balance += np.where(sell, current_price * (1 - self.transaction_cost), 0.0)
+
+        self.current_step += 1
+        dones = self.current_step >= self.max_steps - 1
+
+        self.total_value = self.balance + self.positions * current_price
+        rewards = self.total_value - self.initial_balance
+
+        observation = self._get_observation()
+        info = {}
+        if dones.any():
+            info["final_observation"] = observation.copy()
+            self.current_step[dones] = self.starts[dones]
+            self.balance[dones] = self.initial_balance
+            self.positions[dones] = 0
+            self.total_value[dones] = self.initial_balance
+            observation[dones] = self._get_observation()[dones]
+
+        return observation, rewards, dones, info
+
+
 class DQN(nn.Module):
     def __init__(self, input_dim, output_dim):
         super(DQN, self).__init__()
@@ -84,11 +202,66 @@ class DQN(nn.Module):
         x = torch.relu(self.fc3(x))
         return self.fc4(x)
 
+class ReplayBuffer:
+    """
+    Replay memory of a fixed capacity, kept in preallocated numpy arrays used
+    as rings: the oldest transitions are overwritten when it is full.
+    """
+
+    def __init__(self, capacity, state_size, seed=None):
+        self.capacity = capacity
+        self.states = np.zeros((capacity, state_size), dtype=np.float32)
+        self.actions = np.zeros(capacity, dtype=np.int64)
+        self.rewards = np.zeros(capacity, dtype=np.float64)
+        self.next_states = np.zeros((capacity, state_size), dtype=np.float32)
+        self.dones = np.zeros(capacity, dtype=bool)
+        self.position = 0  # where the next transition goes
+        self.size = 0
+        self.rng = np.random.default_rng(seed)
+
+    def __len__(self):
+        return self.size
+
+    def add(self, state, action, reward, next_state, done):
+        i = self.position
+        self.states[i] = state
+        self.actions[i] = action
+        self.rewards[i] = reward
+        self.next_states[i] = next_state
+        self.dones[i] = done
+        self.position = (i + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+
+    def extend(self, states, actions, rewards, next_states, dones):
+        """
+        Adds a batch of transitions (one per row), for example the steps of a
+        ``VecTradingEnv``.
+        """
+        n = len(actions)
+        idx = (self.position + np.arange(n)) % self.capacity
+        self.states[idx] = states
+        self.actions[idx] = actions
+        self.rewards[idx] = rewards
+        self.next_states[idx] = next_states
+        self.dones[idx] = dones
+        self.position = (self.position + n) % self.capacity
+        self.size = min(self.size + n, self.capacity)
+
+    def sample(self, batch_size):
+        """
+        Returns ``batch_size`` different transitions, taken at random, as the
+        arrays (states, actions, rewards, next_states, dones).
+        """
+        idx = self.rng.choice(self.size, batch_size, replace=False)
+        return (self.states[idx], self.actions[idx], self.rewards[idx],
+                self.next_states[idx], self.dones[idx])
+
+
 class DQNAgent:
-    def __init__(self, state_size, action_size):
+    def __init__(self, state_size, action_size, memory_size=2000, target_update=None):
         self.state_size = state_size
         self.action_size = action_size
-        self.memory = deque(maxlen=2000)
+        self.memory = ReplayBuffer(memory_size, state_size)
         self.gamma = 0.95  # Discount factor
         self.epsilon = 1.0  # Exploration rate
         self.epsilon_decay = 0.995
@@ -99,37 +272,109 @@ class DQNAgent:
         self.optimizer = optim.Adam(self.model.parameters(), lr=self.learning_rate)
         self.criterion = nn.MSELoss()
 
+        # Optional target network, estimating the Q-values of the next states
+        # and synced with the model every ``target_update`` replays
+        self.target_update = target_update
+        self.target_model = None
+        self.replays = 0
+        if target_update:
+            self.target_model = DQN(state_size, action_size).float()
+            self.update_target()
+
+    def update_target(self):
+        self.target_model.load_state_dict(self.model.state_dict())
+        self.target_model.eval()
+
+    def save(self, path):
+        """
+        Saves the weights of the model along with the sizes of the state and
+        of the actions, which ``load`` reads back.
+        """
+        torch.save(dict(state_size=self.state_size, action_size=self.action_size,
+                        model=self.model.state_dict()), path)
+
+    @classmethod
+    def load(cls, path, **kwargs):
+        """
+        Returns an agent with the model saved in ``path`` by ``save``. A bare
+        ``state_dict`` of the model (older files) is also accepted, with the
+        sizes taken from its layers.
+        """
+        checkpoint = torch.load(path)
+        if "model" in checkpoint:
+            state_dict = checkpoint["model"]
+            state_size, action_size = checkpoint["state_size"], checkpoint["action_size"]
+        else:
+            state_dict = checkpoint
+            state_size = state_dict["fc1.weight"].shape[1]
+            action_size = state_dict["fc4.weight"].shape[0]
+
+        agent = cls(state_size, action_size, **kwargs)
+        agent.model.load_state_dict(state_dict)
+        return agent
+
     def remember(self, state, action, reward, next_state, done):
-        self.memory.append((state, action, reward, next_state, done))
+        self.memory.add(state, action, reward, next_state, done)
 
     def act(self, state):
         if np.random.rand() <= self.epsilon:
             return random.randrange(self.action_size)
-        state = torch.tensor(state, dtype=torch.float32).unsqueeze(0)
-        act_values = self.model(state)
-        return torch.argmax(act_values).item()
+        return int(np.argmax(self.q_values([state])[0]))
+
+    def q_values(self, states):
+        """
+        Returns the Q-values of a batch of states (one per row) as a numpy
+        array, computed in a single forward pass without autograd.
+        """
+        states = torch.as_tensor(np.asarray(states, dtype=np.float32))
+        with torch.inference_mode():
+            return self.model(states).numpy()
+
+    def inference(self, script=False):
+        """
+        Puts the agent in inference mode, for backtesting: the model in eval
+        mode and no random actions (epsilon 0), so that the actions are
+        deterministic. With ``script`` the model is also compiled to
+        TorchScript. Returns the agent.
+        """
+        self.model.eval()
+        self.epsilon = 0.0
+        if script and not isinstance(self.model, torch.jit.ScriptModule):
+            self.model = torch.jit.script(self.model)
+        return self
 
     def replay(self, batch_size):
+        """
+        Updates the model with a minibatch of the memory, in a single batched
+        forward and backward pass (one optimizer step).
+        """
         if len(self.memory) < batch_size:
             return
 
-        minibatch = random.sample(self.memory, batch_size)
-        for state, action, reward, next_state, done in minibatch:
-            target = reward
-            if not done:
-                next_state = torch.tensor(next_state, dtype=torch.float32).unsqueeze(0)
-                target = reward + self.gamma * torch.max(self.model(next_state)).item()
+        states, actions, rewards, next_states, dones = self.memory.sample(batch_size)
+        states = torch.as_tensor(states)
+        actions = torch.as_tensor(actions)
+        next_states = torch.as_tensor(next_states)
+
+        with torch.no_grad():
+            target_model = self.target_model or self.model
+            next_q = target_model(next_states).max(dim=1).values
+            targets = torch.as_tensor(rewards, dtype=torch.float32)
+            targets += self.gamma * next_q * torch.as_tensor(~dones)
 
-            state = torch.tensor(state, dtype=torch.float32).unsqueeze(0)
-            target_f = self.model(state).detach().clone()
-            target_f[0][action] = target
+        # Only the Q-values of the actions taken are moved to the targets
+        output = self.model(states)
+        target_f = output.detach().clone()
+        target_f[torch.arange(batch_size), actions] = targets
+        loss = self.criterion(output, target_f)
 
-            output = self.model(state)
-            loss = self.criterion(output, target_f)
+        self.optimizer.zero_grad()
+        loss.backward()
+        self.optimizer.step()
 
-            self.optimizer.zero_grad()
-            loss.backward()
-            self.optimizer.step()
+        self.replays += 1
+        if self.target_model is not None and self.replays % self.target_update == 0:
+            self.update_target()
 
         if self.epsilon > self.epsilon_min:
             self.epsilon *= self.epsilon_decay
@@ -10,14 +10,7 @@ from trading.utils import *
 from trading.base_strategy import *
 from trading.traditional_strategies import *
 from trading.ai_strategies import *
-
-class PandasData_Customized(bt.feeds.PandasData):
-    lines = ('feargreed', 'putcall', 'vix', 'predictions')
-    params = (('feargreed', -4),
-              ('putcall', -3),
-              ('vix', -2),
-              ('predictions', -1),
-              )  # Position of the 'fear_greed' column in df
+from trading.lanes import run_lanes
 
 class AITrader:
     """
@@ -33,7 +26,9 @@ class AITrader:
         start_date: str = None,
         end_date: str = None,
         data_dir: Optional[str] = "./data/us_stock/",
-        log_file: str = "./log/trading_log.txt"
+        log_file: str = "./log/trading_log.txt",
+        optpool: Optional[bt.OptPool] = None, # worker processes kept alive across runs
+        indcache: Optional[str] = None # directory caching the indicator values across runs
     ):
         """
         Initializes the AITrader with the given parameters.
@@ -46,7 +41,9 @@ class AITrader:
         self.strategy = strategy
         self.data_dir = data_dir
         self.log_file = log_file
-        self.cerebro = bt.Cerebro() # backtrader engine
+        self.optpool = optpool
+        self.indcache = indcache
+        self.cerebro = bt.Cerebro(optpool=optpool, indcache=indcache) # backtrader engine
 
         # Open the log file in write mode and store the file handle
         if os.path.exists(self.log_file):
@@ -225,6 +222,27 @@ class AITrader:
             raise ValueError("No strategy specified.")
         return analysis
 
+    def sweep(self, strategy: BaseStrategy, grid: dict, stock_ticker: str = "AAPL") -> pd.DataFrame:
+        """
+        Sweeps the params of the strategy over all the combinations of grid in lanes mode
+        (see trading/lanes.py), with the broker and sizer settings of the trader.
+        """
+        data = pd.read_csv(self.data_dir + f"all_{stock_ticker}.csv",
+                           parse_dates=["Date"],
+                           index_col="Date")
+        data = data[self.start_date : self.end_date]
+        feed = PandasData_Customized(
+                dataname=data,
+                openinterest=None,
+                timeframe=bt.TimeFrame.Days,
+            )
+        results = run_lanes(strategy, feed, grid,
+                            cash=self.cash,
+                            commission=self.commission,
+                            percents=self.size)
+        self.log(f"Swept {len(results)} combinations of {strategy.__name__} params.")
+        return results
+
     def plot(self) -> None:
         """
         Plots the results of the backtest.
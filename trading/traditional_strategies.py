@@ -28,6 +28,12 @@ class NaiveMovingAverage(BaseStrategy):
         self.buy_signal = self.data.close > self.sma  # Price is above the SMA
         self.close_signal = self.data.close < self.sma # Price is below the SMA
 
+    @classmethod
+    def lanes(cls, data, p):
+        # Buy and close signals for one combination of params (lanes mode)
+        sma = bt.indicators.SMA(data.close, period=p.sma_period)
+        return data.close > sma, data.close < sma
+
     def next(self):
         # Check if we are already in a position
         if not self.position:
@@ -55,6 +61,15 @@ class CrossMovingAverage(BaseStrategy):
             plotname="slow_day_sma"
         )
         self.crossover = bt.indicators.CrossOver(self.fast_sma, self.slow_sma)
+
+    @classmethod
+    def lanes(cls, data, p):
+        # Buy and close signals for one combination of params (lanes mode)
+        crossover = bt.indicators.CrossOver(
+            bt.indicators.SMA(data.close, period=p.fast),
+            bt.indicators.SMA(data.close, period=p.slow),
+        )
+        return crossover > 0, crossover < 0
      
     def next(self):
         if self.position.size == 0:
@@ -78,6 +93,14 @@ class BollingerBands(BaseStrategy):
             devfactor=self.params.devfactor
         )
 
+    @classmethod
+    def lanes(cls, data, p):
+        # Buy and close signals for one combination of params (lanes mode)
+        bb = bt.indicators.BollingerBands(
+            data, period=p.period, devfactor=p.devfactor
+        )
+        return data.close < bb.lines.bot, data.close > bb.lines.top
+
     def next(self):
         signal_buy = self.data.close[0] < self.bb.lines.bot[0]
         signal_sell = self.data.close[0] > self.bb.lines.top[0]
@@ -0,0 +1,420 @@
+"""
+Training jobs for the models of the AI strategies, run in parallel processes::
+
+    python -m trading.training [--tickers TICKER ...] [--models MODEL ...]
+                               [--processes N] [--threads N]
+                               [--start-date DATE] [--end-date DATE]
+                               [--episodes N] [--epochs N] [--verbose]
+
+A job trains one model (``Logistic_Regression``, ``Gradient_Boosting``,
+``DQN`` or ``RNN``) for one ticker, like the Model Training page does. By
+default all the models are trained for all the tickers. Each worker process
+runs one job at a time with a bounded number of threads (BLAS, torch,
+TensorFlow), and the number of workers defaults to the CPUs divided by the
+threads per worker.
+
+The artifacts are written atomically (to a temporary file, then renamed), so
+that a backtest running at the same time never loads a partial model:
+
+- ``model/<ticker>_scaler.pkl`` and ``model/<ticker>_<model>_model.pkl``
+  (``Logistic_Regression``, ``Gradient_Boosting``)
+- ``model/<ticker>_DQN_model.pth``
+- ``model/<ticker>_RNN_model.h5``, ``model/<ticker>_RNN_scaler.pkl`` and the
+  predictions read by ``RNNStrategy``, ``data/us_stock/predictions/<ticker>.csv``
+
+From the library, ``TrainingRunner`` starts the jobs without blocking and
+reports the progress as events, which a Streamlit page can poll::
+
+    runner = TrainingRunner(["AAPL", "MSFT"], ["Logistic_Regression", "DQN"])
+    runner.start()
+    ...
+    for event in runner.poll():
+        print(event["ticker"], event["model"], event["status"], event["progress"])
+"""
+import argparse
+import concurrent.futures
+import contextlib
+import multiprocessing
+import os
+import queue
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from trading.ai_strategies import selected_features, selected_features_df
+from trading.utils import calculate_indicators_df
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(ROOT, "data", "us_stock")
+MODEL_DIR = os.path.join(ROOT, "model")
+
+# tickers of the Model Training page
+TICKERS = [
+    "AAPL", "MSFT", "NVDA", "GOOG", "AMZN", "META",
+    "BRK-B", "LLY", "AVGO", "TSLA", "WMT", "JPM",
+    "V", "UNH", "XOM", "ORCL", "MA", "HD", "PG",
+    "COST", "^SPX"
+]
+
+MODELS = ["Logistic_Regression", "Gradient_Boosting", "DQN", "RNN"]
+
+
+@contextlib.contextmanager
+def atomic_path(path: str):
+    """
+    Yields a temporary path, next to ``path`` and with the same extension, to
+    write a file to. The file is renamed to ``path`` when the block succeeds
+    and removed when it fails.
+    """
+    directory, name = os.path.split(path)
+    # unique per process, the jobs of a process run one after the other
+    tmp = os.path.join(directory, f".{name}.{os.getpid()}{os.path.splitext(name)[1]}")
+    try:
+        yield tmp
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def load_data(ticker: str, start_date=None, end_date=None, data_dir: str = DATA_DIR) -> pd.DataFrame:
+    """
+    Loads ``all_<ticker>.csv`` between the given dates (if any).
+    """
+    data = pd.read_csv(os.path.join(data_dir, f"all_{ticker}.csv"), parse_dates=["Date"], index_col="Date")
+    return data.loc[start_date:end_date]
+
+
+def _noprogress(fraction, message=""):
+    pass
+
+
+def train_classifier(ticker: str, model_name: str, data: pd.DataFrame,
+                     model_dir: str = MODEL_DIR, progress=_noprogress) -> None:
+    """
+    Trains a ``Logistic_Regression`` or ``Gradient_Boosting`` model (and its
+    scaler) to predict whether the next close is higher, for ``MLTradingStrategy``.
+    """
+    import joblib
+    from sklearn.preprocessing import StandardScaler
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.ensemble import GradientBoostingClassifier
+
+    progress(0.0, "Calculating indicators and creating features...")
+    data = calculate_indicators_df(data.copy())
+    data['Target'] = (data['Close'].shift(-1) > data['Close']).astype(int)
+    X = data[selected_features]
+    y = data['Target']
+
+    progress(0.2, "Scaling features...")
+    scaler = StandardScaler()
+    X = scaler.fit_transform(X)
+
+    progress(0.5, f"Training {model_name} model...")
+    if model_name == "Logistic_Regression":
+        model = LogisticRegression()
+    elif model_name == "Gradient_Boosting":
+        model = GradientBoostingClassifier()
+    else:
+        raise ValueError(f"Unsupported model name: {model_name}")
+    model.fit(X, y)
+
+    progress(0.8, f"Saving {model_name} model...")
+    with atomic_path(os.path.join(model_dir, f"{ticker}_scaler.pkl")) as path:
+        joblib.dump(scaler, path)
+    with atomic_path(os.path.join(model_dir, f"{ticker}_{model_name}_model.pkl")) as path:
+        joblib.dump(model, path)
+
+
+def train_dqn(ticker: str, data: pd.DataFrame, model_dir: str = MODEL_DIR,
+              progress=_noprogress, episodes: int = 200, batch_size: int = 32) -> None:
+    """
+    Trains a ``DQNAgent`` on a ``TradingEnv`` of the data, replaying a
+    minibatch of the memory after each episode. The state is the features of
+    ``DQNStrategy`` (without the balance and the positions, which depend on
+    the path taken), so that the strategy can run the model.
+    """
+    from trading.rl_module import TradingEnv, DQNAgent
+
+    env = TradingEnv(selected_features_df(data), account=False)
+    agent = DQNAgent(env.observation_space.shape[0], env.action_space.n)
+
+    for e in range(episodes):
+        state = env.reset()
+        total_reward = 0
+
+        for _ in range(env.max_steps):
+            action = agent.act(state)
+            next_state, reward, done, _ = env.step(action)
+            agent.remember(state, action, reward, next_state, done)
+            state = next_state
+            total_reward += reward
+
+            if done:
+                break
+
+        agent.replay(batch_size)
+        progress((e + 1) / episodes, f"Episode {e + 1}/{episodes}, Total Reward: {total_reward}")
+
+    with atomic_path(os.path.join(model_dir, f"{ticker}_DQN_model.pth")) as path:
+        agent.save(path)
+
+
+def train_rnn(ticker: str, data: pd.DataFrame, model_dir: str = MODEL_DIR,
+              data_dir: str = DATA_DIR, progress=_noprogress, epochs: int = 50,
+              batch_size: int = 32, time_step: int = 50) -> None:
+    """
+    Trains an RNN on the ``Open`` prices of the previous ``time_step`` bars
+    and saves its predictions for ``RNNStrategy``.
+    """
+    import joblib
+    from sklearn.preprocessing import MinMaxScaler
+    from keras.models import Sequential
+    from keras.layers import Dense, SimpleRNN, Dropout
+
+    # Input sequences of the whole data
+    dataset = data['Open'].values.reshape(-1, 1)
+    scaler = MinMaxScaler(feature_range=(0, 1))
+    dataset_scaled = scaler.fit_transform(dataset)
+    X_data = np.array([dataset_scaled[i - time_step:i, 0] for i in range(time_step, len(dataset_scaled))])
+    X_data = np.reshape(X_data, (X_data.shape[0], X_data.shape[1], 1))
+
+    model = Sequential()
+    model.add(SimpleRNN(units=50, activation="tanh", return_sequences=True, input_shape=(X_data.shape[1], 1)))
+    model.add(Dropout(0.2))
+    for _ in range(4):
+        model.add(SimpleRNN(units=50, activation="tanh", return_sequences=True))
+        model.add(Dropout(0.2))
+    model.add(SimpleRNN(units=50))
+    model.add(Dropout(0.2))
+    model.add(Dense(units=1))
+    model.compile(optimizer="adam", loss="mean_squared_error")
+
+    X_train = X_data[:-1]
+    y_train = data['Open'].values[time_step:len(data) - 1].reshape(-1, 1)
+    y_train = scaler.fit_transform(y_train)  # Scale target values
+    for epoch in range(epochs):
+        history = model.fit(X_train, y_train, epochs=1, batch_size=batch_size, verbose=0)
+        progress((epoch + 1) / epochs, f"Epoch {epoch + 1}/{epochs}, Loss: {history.history['loss'][-1]:.4f}")
+
+    predictions = scaler.inverse_transform(model.predict(X_data, verbose=0))
+    data = data.copy()
+    data['predictions'] = np.nan
+    data.iloc[time_step:, data.columns.get_loc('predictions')] = predictions.flatten()
+
+    with atomic_path(os.path.join(model_dir, f"{ticker}_RNN_model.h5")) as path:
+        model.save(path)
+    with atomic_path(os.path.join(model_dir, f"{ticker}_RNN_scaler.pkl")) as path:
+        joblib.dump(scaler, path)
+    os.makedirs(os.path.join(data_dir, "predictions"), exist_ok=True)
+    with atomic_path(os.path.join(data_dir, "predictions", f"{ticker}.csv")) as path:
+        data.to_csv(path)
+
+
+# Queue of the progress events of the worker processes (set by _init_worker)
+_events = None
+
+
+def _init_worker(events, threads: int) -> None:
+    global _events
+    _events = events
+
+    # numpy is already loaded, torch and TensorFlow read these when imported
+    for name in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS",
+                 "TF_NUM_INTRAOP_THREADS", "TF_NUM_INTEROP_THREADS"):
+        os.environ[name] = str(threads)
+    try:
+        from threadpoolctl import threadpool_limits
+    except ImportError:
+        pass
+    else:
+        threadpool_limits(limits=threads)
+
+
+def _event(ticker: str, model: str, status: str, progress: float = 0.0, message: str = "") -> dict:
+    return dict(ticker=ticker, model=model, status=status, progress=progress,
+                message=message, time=time.time())
+
+
+def run_job(ticker: str, model: str, options: dict) -> None:
+    """
+    Trains ``model`` for ``ticker``. ``options`` holds the directories, the
+    dates of the data and the arguments of the training function. The
+    progress goes to the queue of the worker, if any.
+    """
+    def progress(fraction, message=""):
+        if _events is not None:
+            _events.put(_event(ticker, model, "progress", fraction, message))
+
+    options = dict(options)
+    data_dir = options.pop("data_dir", DATA_DIR)
+    model_dir = options.pop("model_dir", MODEL_DIR)
+    data = load_data(ticker, options.pop("start_date", None), options.pop("end_date", None), data_dir)
+
+    if model in ("Logistic_Regression", "Gradient_Boosting"):
+        train_classifier(ticker, model, data, model_dir, progress)
+    elif model == "DQN":
+        kwargs = {k: options[k] for k in ("episodes", "batch_size") if k in options}
+        train_dqn(ticker, data, model_dir, progress, **kwargs)
+    elif model == "RNN":
+        kwargs = {k: options[k] for k in ("epochs", "time_step") if k in options}
+        train_rnn(ticker, data, model_dir, data_dir, progress, **kwargs)
+    else:
+        raise ValueError(f"Unsupported model: {model}")
+
+
+def _run_job(ticker: str, model: str, options: dict) -> None:
+    _events.put(_event(ticker, model, "started"))
+    run_job(ticker, model, options)
+
+
+class TrainingRunner:
+    """
+    Runs the training jobs of a tickers x models matrix in a pool of worker
+    processes, without blocking the caller.
+
+    The workers run with ``threads`` threads each, and there are ``processes``
+    of them (default: the CPUs divided by ``threads``). ``options`` are passed
+    to ``run_job`` (``start_date``, ``end_date``, ``episodes``, ``epochs``,
+    ...).
+
+    ``poll`` returns the new events (dicts with ``ticker``, ``model``,
+    ``status``, ``progress``, ``message`` and ``time``). The status is
+    ``started``, ``progress``, ``done`` or ``failed`` (the message is then the
+    error). ``status`` holds the latest event of each job.
+    """
+
+    def __init__(self, tickers: list = None, models: list = None, processes: int = None,
+                 threads: int = 1, model_dir: str = MODEL_DIR, data_dir: str = DATA_DIR,
+                 **options):
+        self.jobs = [(ticker, model) for ticker in (tickers or TICKERS) for model in (models or MODELS)]
+        self.threads = threads
+        self.processes = processes or max(1, (os.cpu_count() or 1) // threads)
+        self.options = dict(options, model_dir=model_dir, data_dir=data_dir)
+        self.status = {job: _event(job[0], job[1], "pending") for job in self.jobs}
+
+        self._executor = None
+        self._futures = {}
+        self._events = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.close()
+
+    def start(self):
+        """Submits the jobs to the worker processes and returns the runner"""
+        os.makedirs(self.options["model_dir"], exist_ok=True)
+
+        # spawned workers, as forking a process with threads (Streamlit,
+        # torch) can deadlock
+        context = multiprocessing.get_context("spawn")
+        self._events = context.Queue()
+        self._executor = concurrent.futures.ProcessPoolExecutor(
+            self.processes, mp_context=context, initializer=_init_worker,
+            initargs=(self._events, self.threads))
+        self._futures = {self._executor.submit(_run_job, ticker, model, self.options): (ticker, model)
+                         for ticker, model in self.jobs}
+        return self
+
+    def poll(self) -> list:
+        """Returns the events since the previous call, without waiting"""
+        events = []
+        while True:
+            try:
+                events.append(self._events.get_nowait())
+            except (queue.Empty, AttributeError):  # no queue before start
+                break
+
+        # the jobs are done once their events are in
+        for future, job in list(self._futures.items()):
+            if future.done():
+                error = future.exception()
+                if error is None:
+                    events.append(_event(job[0], job[1], "done", 1.0))
+                else:
+                    events.append(_event(job[0], job[1], "failed", message=f"{type(error).__name__}: {error}"))
+                del self._futures[future]
+
+        for event in events:
+            job = event["ticker"], event["model"]
+            if self.status[job]["status"] not in ("done", "failed"):  # late progress
+                self.status[job] = event
+        return events
+
+    def done(self) -> bool:
+        return not self._futures
+
+    def wait(self, callback=None, interval: float = 0.5) -> dict:
+        """
+        Polls the events until all the jobs are done, handing them over to
+        ``callback`` (if given). Returns the latest event of each job.
+        """
+        while True:
+            for event in self.poll():
+                if callback is not None:
+                    callback(event)
+            if self.done():
+                return self.status
+            time.sleep(interval)
+
+    def close(self, cancel: bool = False) -> None:
+        """Stops the worker processes, after the running jobs (and the pending ones unless ``cancel``)"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=cancel)
+            self._executor = None
+
+
+def main(argv: list = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m trading.training",
+        description="Train the models of the AI strategies in parallel processes")
+    parser.add_argument("--tickers", nargs="+", default=TICKERS,
+                        help="tickers to train the models for (default: all)")
+    parser.add_argument("--models", nargs="+", default=MODELS, choices=MODELS,
+                        help="models to train (default: all)")
+    parser.add_argument("--processes", type=int, default=None,
+                        help="worker processes (default: the CPUs divided by --threads)")
+    parser.add_argument("--threads", type=int, default=1,
+                        help="threads of each worker process")
+    parser.add_argument("--model-dir", default=MODEL_DIR,
+                        help="directory of the model files")
+    parser.add_argument("--data-dir", default=DATA_DIR,
+                        help="directory of the all_<ticker>.csv files")
+    parser.add_argument("--start-date", default=None,
+                        help="first date of the training data")
+    parser.add_argument("--end-date", default=None,
+                        help="last date of the training data")
+    parser.add_argument("--episodes", type=int, default=200,
+                        help="training episodes of the DQN models")
+    parser.add_argument("--epochs", type=int, default=50,
+                        help="training epochs of the RNN models")
+    parser.add_argument("-v", "--verbose", action="store_true",
+                        help="print the progress of the jobs, not only when they start and end")
+    args = parser.parse_args(argv)
+
+    runner = TrainingRunner(args.tickers, args.models, args.processes, args.threads,
+                            args.model_dir, args.data_dir, start_date=args.start_date,
+                            end_date=args.end_date, episodes=args.episodes, epochs=args.epochs)
+
+    def report(event):
+        if event["status"] == "progress" and not args.verbose:
+            return
+        print(f"{event['ticker']:<6} {event['model']:<20} {event['status']:<8} "
+              f"{100 * event['progress']:>4.0f}% {event['message']}", flush=True)
+
+    started = time.time()
+    with runner:
+        status = runner.wait(report)
+
+    failed = [job for job, event in status.items() if event["status"] == "failed"]
+    print(f"{len(status) - len(failed)} jobs done, {len(failed)} failed in {time.time() - started:.0f}s")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())